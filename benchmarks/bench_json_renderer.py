@@ -0,0 +1,109 @@
+"""
+Rendering and parsing cost of DRF's JSON classes versus auth.renderers.FastJSONRenderer
+and auth.parsers.FastJSONParser.
+
+Renders list payloads shaped like ``users/`` and ``users/changes/`` responses
+(the latter with datetimes) and parses login request bodies. Every rendered
+payload is checked to be byte-identical before it is timed.
+
+Run from the repository root with the usual .env in place:
+
+    python benchmarks/bench_json_renderer.py --rows 1000 --repeat 5
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.utils.serializer_helpers import ReturnList  # noqa: E402
+from auth import parsers, renderers  # noqa: E402
+
+
+def users_payload(rows, with_changes=False):
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    users = []
+    for i in range(rows):
+        user = {
+            'id': i + 1,
+            'email': None if i % 3 else f'user{i}@example.com',
+            'phone_number': f'+9936{i:07d}',
+            'first_name': 'Aýna',
+            'last_name': f'Orazowa {i}',
+            'fullname': f'Aýna Orazowa {i}',
+            'role': 'teacher' if i % 4 else 'student',
+            'institution': i % 50 or None,
+            'educational_institution': f'School {i % 50}' if i % 50 else None,
+            'is_active': i % 20 != 0,
+            'is_phone_verified': bool(i % 2),
+        }
+        if with_changes:
+            user.update({
+                'is_email_verified': bool(i % 3),
+                'profile_version': i % 7 + 1,
+                'updated_at': started + timedelta(seconds=i, microseconds=i * 37),
+            })
+        users.append(user)
+    return ReturnList(users, serializer=None)
+
+
+def bench(func, repeat, loops):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, time.perf_counter() - started)
+    return best / loops
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--loops', type=int, default=20)
+    args = parser.parse_args()
+
+    if renderers.orjson is None:
+        print('orjson is not installed; FastJSONRenderer falls back to JSONRenderer', file=sys.stderr)
+
+    results = {}
+    for name, payload in (
+        ('users', users_payload(args.rows)),
+        ('users/changes', users_payload(args.rows, with_changes=True)),
+    ):
+        expected = JSONRenderer().render(payload)
+        if renderers.FastJSONRenderer().render(payload) != expected:
+            sys.exit(f'{name}: FastJSONRenderer output differs from JSONRenderer')
+        stdlib = bench(lambda: JSONRenderer().render(payload), args.repeat, args.loops)
+        fast = bench(lambda: renderers.FastJSONRenderer().render(payload), args.repeat, args.loops)
+        results[f'render {name}'] = (stdlib, fast, len(expected))
+
+    body = json.dumps({'phone_number': '+99365000001', 'password': 'secret-pass'}).encode()
+    loops = args.loops * 1000
+    stdlib = bench(lambda: JSONParser().parse(io.BytesIO(body)), args.repeat, loops)
+    fast = bench(lambda: parsers.FastJSONParser().parse(io.BytesIO(body)), args.repeat, loops)
+    results['parse login'] = (stdlib, fast, len(body))
+
+    for name, (stdlib, fast, size) in results.items():
+        print(f'{name:<22} {size:>9} bytes  json {stdlib * 1e6:>10.1f} us  fast {fast * 1e6:>10.1f} us  x{stdlib / fast:.2f}')
+    print(json.dumps({
+        'rows': args.rows,
+        'orjson': renderers.orjson is not None,
+        'microseconds': {name: {'json': round(stdlib * 1e6, 1), 'fast': round(fast * 1e6, 1)} for name, (stdlib, fast, _) in results.items()},
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark for the JSON log formatters in auth.logging_config.
+
+Reports records/sec for CustomJsonFormatter (python-json-logger) and
+FastJsonFormatter with the stdlib and, if installed, the orjson encoder.
+
+Run from the repository root with the usual .env in place:
+
+    python benchmarks/bench_log_formatter.py --records 20000 --repeat 5
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from auth import logging_config  # noqa: E402
+
+
+def make_records(count):
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        exc_info = sys.exc_info()
+
+    records = []
+    for i in range(count):
+        if i % 50 == 0:
+            record = logging.LogRecord('paytoleg', logging.ERROR, __file__, 30, 'Request failed', (), exc_info, func='bench')
+        else:
+            record = logging.LogRecord('paytoleg', logging.INFO, __file__, 20, 'User %s updated', (i,), None, func='bench')
+        record.request_id = '1f0c6d2e-8a57-4f8f-9d2c-%012d' % i
+        record.user_id = i
+        record.ip = '127.0.0.1'
+        records.append(record)
+    return records
+
+
+def bench(formatter, records, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        for record in records:
+            record.exc_text = None
+        started = time.perf_counter()
+        for record in records:
+            formatter.format(record)
+        best = min(best, time.perf_counter() - started)
+    return len(records) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    formatters = {
+        'CustomJsonFormatter': logging_config.CustomJsonFormatter(
+            '%(timestamp)s %(level)s %(name)s %(module)s %(funcName)s %(lineNo)d %(message)s'
+        ),
+        'FastJsonFormatter[json]': logging_config.FastJsonFormatter(json_dumps=logging_config._stdlib_dumps),
+    }
+    if logging_config.orjson is not None:
+        formatters['FastJsonFormatter[orjson]'] = logging_config.FastJsonFormatter(json_dumps=logging_config._orjson_dumps)
+
+    records = make_records(args.records)
+    results = {name: round(bench(formatter, records, args.repeat)) for name, formatter in formatters.items()}
+    baseline = results['CustomJsonFormatter']
+
+    for name, rate in results.items():
+        print(f'{name:<28} {rate:>10} records/sec  x{rate / baseline:.2f}')
+    print(json.dumps({'records': args.records, 'repeat': args.repeat, 'records_per_sec': results}))
+
+
+if __name__ == '__main__':
+    main()
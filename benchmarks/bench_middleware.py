@@ -0,0 +1,81 @@
+"""
+Per-request middleware overhead of the full stack versus the route-aware stack.
+
+Drives a JWT API endpoint that does not touch the database
+(``POST api/v1/token/verify/`` with an invalid token) through the Django test
+client, once with the previous MIDDLEWARE list and once with the current one.
+
+Run from the repository root with the usual .env in place:
+
+    python benchmarks/bench_middleware.py --requests 5000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+FULL_MIDDLEWARE = [
+    'auth.middleware.MetricsMiddleware',
+    'auth.middleware.ServerTimingMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'auth.middleware.RequestLoggingMiddleware',
+]
+
+
+def bench(middleware, path, requests, repeat):
+    with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=['testserver']):
+        client = Client()
+        for _ in range(100):
+            client.post(path, {'token': 'invalid'})
+
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(requests):
+                client.post(path, {'token': 'invalid'})
+            best = min(best, time.perf_counter() - started)
+    return round(best / requests * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--path', default='/api/v1/token/verify/')
+    parser.add_argument('--with-logging', action='store_true', help='keep request logging to files enabled')
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logging.getLogger('paytoleg').setLevel(logging.WARNING)
+
+    results = {
+        'full': bench(FULL_MIDDLEWARE, args.path, args.requests, args.repeat),
+        'route_aware': bench(settings.MIDDLEWARE, args.path, args.requests, args.repeat),
+    }
+    for name, usec in results.items():
+        print(f'{name:<12} {usec:>8.1f} us/request')
+    print(f'saved        {results["full"] - results["route_aware"]:>8.1f} us/request')
+    print(json.dumps({'path': args.path, 'requests': args.requests, 'us_per_request': results}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""
+HTTP load test of the auth endpoints against a locally started server.
+
+Starts a fake SMS gateway (which also captures the verification codes), migrates
+a fresh SQLite database (or uses --database-url, e.g. a local Postgres), starts
+gunicorn with gunicorn.conf.py and runs the sign-up flow from --concurrency
+client threads:
+
+    registration/ (phone) -> registration/resend-phone/ -> registration/verify-phone/
+    -> token/ -> token/refresh/ -> users/
+    registration/ (email) -> registration/resend-email/
+
+Email is sent through the locmem backend, so its codes are not visible here and
+registration/verify-email/ is not driven. Throughput and p50/p95/p99 latency per
+endpoint are printed as JSON, so runs can be compared over time; the run exits
+non-zero if any request failed:
+
+    python benchmarks/load_test.py --iterations 200 --concurrency 8 --output load.json
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import dj_database_url
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+API = '/api/v1/'
+CODE_RE = re.compile(r'(\d{6})')
+
+
+class FakeSmsGateway(BaseHTTPRequestHandler):
+    """Accepts Zender ``send/sms`` calls and remembers the last code per phone."""
+    codes = {}
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        form = parse_qs(body)
+        match = CODE_RE.search(form.get('message', [''])[0])
+        if match:
+            self.codes[form['phone'][0]] = match.group(1)
+        payload = json.dumps({'status': 200, 'message': 'Queued'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return round(sorted_values[index] * 1000, 2)
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, endpoint, duration, ok):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(duration)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint, durations in self.latencies.items():
+            durations = sorted(durations)
+            endpoints[endpoint] = {
+                'requests': len(durations),
+                'errors': self.errors.get(endpoint, 0),
+                'rps': round(len(durations) / elapsed, 1),
+                'p50_ms': percentile(durations, 0.50),
+                'p95_ms': percentile(durations, 0.95),
+                'p99_ms': percentile(durations, 0.99),
+            }
+        total = sum(len(durations) for durations in self.latencies.values())
+        return {'elapsed_s': round(elapsed, 2), 'requests': total, 'rps': round(total / elapsed, 1), 'endpoints': endpoints}
+
+
+class Client:
+    """One keep-alive connection per client thread."""
+
+    def __init__(self, port, recorder):
+        self.port = port
+        self.recorder = recorder
+        self.connection = None
+
+    def request(self, endpoint, method='POST', data=None, token=None, expected=(200, 201)):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        body = json.dumps(data) if data is not None else None
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            self.connection.request(method, API + endpoint, body=body, headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection = None
+            payload, status = b'', 0
+        self.recorder.add(endpoint, time.perf_counter() - started, status in expected)
+        try:
+            return json.loads(payload) if payload else {}
+        except ValueError:
+            return {}
+
+
+def phone_flow(client, password):
+    phone_number = '+9936' + str(uuid.uuid4().int)[:7]
+    client.request('registration/', data={
+        'phone_number': phone_number, 'password1': password, 'password2': password,
+        'first_name': 'Load', 'last_name': 'Test', 'educational_institution': '',
+    })
+    client.request('registration/resend-phone/', data={'phone_number': phone_number})
+    code = FakeSmsGateway.codes.get(phone_number, '000000')
+    client.request('registration/verify-phone/', data={'phone_number': phone_number, 'code': code})
+    tokens = client.request('token/', data={'phone_number': phone_number, 'password': password})
+    refreshed = client.request('token/refresh/', data={'refresh': tokens.get('refresh', '')})
+    client.request('users/', method='GET', token=refreshed.get('access') or tokens.get('access'))
+
+
+def email_flow(client, password):
+    email = f'load-{uuid.uuid4().hex[:12]}@example.com'
+    client.request('registration/', data={
+        'email': email, 'password1': password, 'password2': password,
+        'first_name': 'Load', 'last_name': 'Test', 'educational_institution': '',
+    })
+    client.request('registration/resend-email/', data={'email': email})
+
+
+def wait_until_up(port, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f'Server exited with {server.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/healthz')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('Server did not start in time')
+
+
+def configured_database(env):
+    """NAME of the default database as the app resolves it with ``env``."""
+    code = 'import django; django.setup(); from django.conf import settings; print(settings.DATABASES["default"]["NAME"])'
+    result = subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, env=env, check=True, capture_output=True, text=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100, help='Sign-up flows to run (each phone flow is 6 requests).')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads.')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers.')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker.')
+    parser.add_argument('--email-ratio', type=float, default=0.2, help='Share of flows that register by email.')
+    parser.add_argument('--database-url', help='Use this database instead of a fresh SQLite file.')
+    parser.add_argument('--output', help='Also write the JSON report to this file.')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix='auth-load-')
+    gateway = ThreadingHTTPServer(('127.0.0.1', free_port()), FakeSmsGateway)
+    threading.Thread(target=gateway.serve_forever, daemon=True).start()
+    port = free_port()
+
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': 'auth.settings',
+        'DATABASE_URL': args.database_url or f'sqlite:///{tmp_dir}/load.sqlite3',
+        'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+        # No worker is started, so SMS tasks run inline and reach the fake gateway
+        'CELERY_TASK_ALWAYS_EAGER': 'True',
+        'ZENDER_BASE_URL': f'http://127.0.0.1:{gateway.server_port}',
+        'DEBUG': 'False',
+        'ALLOWED_HOSTS': '127.0.0.1,localhost',
+        'PROMETHEUS_MULTIPROC_DIR': os.path.join(tmp_dir, 'prometheus'),
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+    }
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'])
+    for name, value in (('SECRET_KEY', 'load-test'), ('REDIS_URL', 'memory://'), ('EMAIL_HOST_PASSWORD', 'unused'),
+                        ('ZENDER_API_KEY', 'unused'), ('ZENDER_SENDER_ID', 'unused')):
+        env.setdefault(name, value)
+
+    # Never migrate or load a database other than the one asked for
+    expected = str(dj_database_url.parse(env['DATABASE_URL'])['NAME'])
+    configured = configured_database(env)
+    if configured != expected:
+        raise SystemExit(f'Settings resolve the database to {configured!r}, expected {expected!r}; check .env')
+
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '-v0'], cwd=SRC_DIR, env=env, check=True)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'auth.wsgi:application', '--config', 'gunicorn.conf.py'],
+        cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(port, server)
+        recorder = Recorder()
+        email_every = round(1 / args.email_ratio) if args.email_ratio > 0 else 0
+        local = threading.local()
+
+        def run(iteration):
+            if not hasattr(local, 'client'):
+                local.client = Client(port, recorder)
+            if email_every and iteration % email_every == 0:
+                email_flow(local.client, 'Load-test-pass1')
+            else:
+                phone_flow(local.client, 'Load-test-pass1')
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(run, range(args.iterations)))
+        report = recorder.report(time.perf_counter() - started)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+        gateway.shutdown()
+
+    report['config'] = {
+        'iterations': args.iterations,
+        'concurrency': args.concurrency,
+        'workers': args.workers,
+        'threads': args.threads,
+        'database': 'custom' if args.database_url else 'sqlite',
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            report_file.write(output)
+    failed = {endpoint: stats['errors'] for endpoint, stats in report['endpoints'].items() if stats['errors']}
+    if failed:
+        raise SystemExit(f'Requests failed: {failed}')
+
+
+if __name__ == '__main__':
+    main()
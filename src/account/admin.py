@@ -1,15 +1,98 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from account import models
+from account.managers import CustomUserManager
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses the planner's row estimate instead of COUNT(*) for unfiltered
+    changelists of large PostgreSQL tables; small or filtered lists are
+    counted exactly.
+    """
+    exact_count_below = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return super().count
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        estimate = row[0] if row else -1
+        # -1 means the table has never been analysed
+        if estimate < self.exact_count_below:
+            return super().count
+        return estimate
+
+
+class IdentifierSearchMixin:
+    """
+    Searches by exact canonical email or phone number, which the unique
+    indexes answer directly, instead of the default icontains scans.
+    """
+    search_help_text = 'Exact email or phone number'
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if '@' in search_term:
+            lookup = {self.identifier_lookups['email']: CustomUserManager.normalize_email(search_term)}
+        else:
+            lookup = {self.identifier_lookups['phone_number']: CustomUserManager.normalize_phone_number(search_term)}
+        return queryset.filter(**lookup), False
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
 @admin.register(models.CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(IdentifierSearchMixin, ScalableModelAdmin):
     list_display = ('id', 'phone_number', 'is_active', 'is_superuser', 'is_email_verified', 'is_phone_verified')
+    list_filter = ('role', 'is_active')
+    search_fields = ('email', 'phone_number')
+    identifier_lookups = {'email': 'email', 'phone_number': 'phone_number'}
+    autocomplete_fields = ('institution',)
+
+
+@admin.register(models.Institution)
+class InstitutionAdmin(ScalableModelAdmin):
+    list_display = ('id', 'name', 'created_at')
+    search_fields = ('normalized_name',)
+    readonly_fields = ('normalized_name',)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        # A case-sensitive prefix of the unique normalized name can use its index,
+        # unlike the istartswith of a '^' search field
+        return queryset.filter(normalized_name__startswith=models.Institution.normalize_name(search_term)), False
     
     
 @admin.register(models.PhoneVerification)
-class CustomPhoneVerificationAdmin(admin.ModelAdmin):
+class CustomPhoneVerificationAdmin(IdentifierSearchMixin, ScalableModelAdmin):
     list_display = ('id', 'user', 'phone_number', 'code', 'is_verified', 'created_at')
+    list_select_related = ('user',)
+    list_filter = ('is_verified',)
+    search_fields = ('phone_number',)
+    identifier_lookups = {'email': 'user__email', 'phone_number': 'phone_number'}
+    raw_id_fields = ('user',)
 
 @admin.register(models.EmailVerification)
-class CustomEmailVerificationAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'email', 'code', 'is_verified', 'created_at')
\ No newline at end of file
+class CustomEmailVerificationAdmin(IdentifierSearchMixin, ScalableModelAdmin):
+    list_display = ('id', 'user', 'email', 'code', 'is_verified', 'created_at')
+    list_select_related = ('user',)
+    list_filter = ('is_verified',)
+    search_fields = ('email',)
+    identifier_lookups = {'email': 'email', 'phone_number': 'user__phone_number'}
+    raw_id_fields = ('user',)
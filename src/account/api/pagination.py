@@ -0,0 +1,61 @@
+import base64
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def encode_cursor(updated_at, pk):
+    """Opaque cursor pointing just after the row with this (updated_at, id)."""
+    raw = json.dumps([updated_at.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        updated_at, pk = json.loads(raw)
+        position = parse_datetime(updated_at), int(pk)
+    except (ValueError, TypeError):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+    if position[0] is None:
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+    return position
+
+
+def parse_limit(value):
+    if value in (None, ''):
+        return settings.USER_CHANGE_FEED_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValidationError({'limit': 'A valid integer is required.'})
+    if limit < 1:
+        raise ValidationError({'limit': 'Ensure this value is greater than or equal to 1.'})
+    return min(limit, settings.USER_CHANGE_FEED_MAX_PAGE_SIZE)
+
+
+def change_feed_page(queryset, cursor=None, limit=None):
+    """
+    Return (rows, next_cursor, has_more) for rows ordered by (updated_at, id).
+
+    Rows touched within the settle window are held back: updated_at is taken
+    before commit, so a slower transaction can still land behind a cursor
+    that has already been handed out.
+    """
+    limit = parse_limit(limit)
+    settle = timezone.now() - timedelta(seconds=settings.USER_CHANGE_FEED_SETTLE_SECONDS)
+    queryset = queryset.filter(updated_at__lte=settle)
+    if cursor:
+        updated_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+
+    rows = list(queryset.order_by('updated_at', 'id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    # An empty page keeps the caller's cursor so it can simply poll again
+    next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id) if rows else cursor
+    return rows, next_cursor, has_more
@@ -1,30 +1,103 @@
-from os import environ as env
 from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
-from dotenv import load_dotenv
 from account import models, tasks, services, exceptions
-from auth.logging_config import logger
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from account.managers import CustomUserManager, E164_RE
+from auth.logging_config import logger, log_event
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from account.tokens import add_profile_claims
+
+def canonical_email(value):
+    return CustomUserManager.normalize_email(value)
+
+
+def canonical_phone_number(value):
+    """Normalize to E.164 so lookups and duplicate checks match the stored form."""
+    if not value:
+        return value
+    phone_number = CustomUserManager.normalize_phone_number(value)
+    if not E164_RE.match(phone_number):
+        raise serializers.ValidationError('Enter a valid phone number.')
+    return phone_number
+
+
+def send_verification_sms(phone_number, code):
+    """Hand an interactive code to the high priority otp queue (see CELERY_TASK_ROUTES)."""
+    try:
+        tasks.send_sms_async.delay(phone_number, code)
+    except Exception as e:
+        logger.error('Failed to queue SMS to %s: %s', phone_number, e)
+        raise exceptions.VerificationCodeSentFailure(f'Failed to send SMS to {phone_number}')
 
-load_dotenv()
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
-
-        token['role'] = user.role 
         token['user_id'] = user.id
+        return add_profile_claims(token, user)
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Issues the new access token with the user's current profile claims."""
 
-        return token
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(jwt_settings.USER_ID_CLAIM)
+        user = get_user_model().objects.select_related('institution').filter(
+            **{jwt_settings.USER_ID_FIELD: user_id}
+        ).first()
+        if user is None or not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        # Claims of the refresh token are copied into the access token
+        add_profile_claims(refresh, user)
+        data = {'access': str(refresh.access_token)}
+
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            if jwt_settings.BLACKLIST_AFTER_ROTATION and hasattr(refresh, 'blacklist'):
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+
+        return data
     
     
+class InstitutionSerializer(serializers.ModelSerializer):
+    """Serializer for the institution directory."""
+    class Meta:
+        model = models.Institution
+        fields = ('id', 'name')
+
+
 class UsersListSerializer(serializers.ModelSerializer):
     """Serializer for listing all users."""
+    educational_institution = serializers.CharField(source='institution.name', read_only=True, default=None)
+
     class Meta:
         model = models.CustomUser
-        fields = ('id', 'email', 'phone_number', 'first_name', 'last_name', 'fullname', 'role', 'educational_institution', 'is_active', 'is_phone_verified')
+        fields = ('id', 'email', 'phone_number', 'first_name', 'last_name', 'fullname', 'role', 'institution', 'educational_institution', 'is_active', 'is_phone_verified')
+
+
+class UserListFilterSerializer(serializers.Serializer):
+    """Query parameters accepted by the users list."""
+    institution = serializers.IntegerField(required=False, min_value=1)
+    role = serializers.ChoiceField(choices=models.CustomUser.ROLE_CHOICES, required=False)
+
+
+class UserChangeSerializer(UsersListSerializer):
+    """Serializer for user change feed entries, deactivated users included."""
+    class Meta(UsersListSerializer.Meta):
+        fields = UsersListSerializer.Meta.fields + ('is_email_verified', 'profile_version', 'updated_at')
 
 
 class UserRegisterSerializer(serializers.Serializer):
@@ -46,7 +119,13 @@ class UserRegisterSerializer(serializers.Serializer):
     first_name = serializers.CharField(required=True)
     last_name = serializers.CharField(required=True)
     role = serializers.ChoiceField(choices=models.CustomUser.ROLE_CHOICES, default='teacher')
-    educational_institution = serializers.CharField(required=False, allow_blank=True)
+    educational_institution = serializers.CharField(required=False, allow_blank=True, max_length=100)
+
+    def validate_email(self, value):
+        return canonical_email(value)
+
+    def validate_phone_number(self, value):
+        return canonical_phone_number(value)
 
     def validate(self, attrs):
         """Validate registration data before creating a user."""
@@ -66,11 +145,11 @@ class UserRegisterSerializer(serializers.Serializer):
             raise serializers.ValidationError({'password2': 'Passwords must match.'})
 
         if email and models.CustomUser.objects.filter(email=email).exists():
-            logger.warning(f'Registration attempt with existing email: {email}')
+            logger.warning('Registration attempt with existing email: %s', email)
             raise serializers.ValidationError({'email': 'A user with this email already exists.'})
 
         if phone_number and models.CustomUser.objects.filter(phone_number=phone_number).exists():
-            logger.warning(f'Registration attempt with existing phone number: {phone_number}')
+            logger.warning('Registration attempt with existing phone number: %s', phone_number)
             raise serializers.ValidationError(
                 {'phone_number': 'A user with this phone number already exists.'}
             )
@@ -84,7 +163,7 @@ class UserRegisterSerializer(serializers.Serializer):
             self._handle_verification(user, validated_data, verification_code)
             return user
         except Exception as e:
-            logger.error(f"Error creating user: {str(e)}", exc_info=True)
+            logger.error('Error creating user: %s', e, exc_info=True)
             raise serializers.ValidationError({'non_field_errors': f'Error creating user: {str(e)}'})
         
     def _create_user(self, data):
@@ -93,7 +172,7 @@ class UserRegisterSerializer(serializers.Serializer):
             "first_name": data["first_name"],
             "last_name": data["last_name"],
             "role": data["role"],
-            "educational_institution": data["educational_institution"],
+            "institution": models.Institution.objects.get_for_name(data.get("educational_institution")),
         }
 
         if data.get("phone_number"):
@@ -101,13 +180,11 @@ class UserRegisterSerializer(serializers.Serializer):
                 phone_number=data["phone_number"],
                 **common_fields
             )
-            logger.info(f'New user created. ID: {user.id}, Phone: {user.phone_number}')
         elif data.get("email"):
             user = models.CustomUser.objects.create_user(
                 email=data["email"],
                 **common_fields
             )
-            logger.info(f'New user created. ID: {user.id}, Email: {user.email}')
         else:
             raise serializers.ValidationError({'non_field_errors': 'Either phone number or email must be provided.'})
 
@@ -115,15 +192,13 @@ class UserRegisterSerializer(serializers.Serializer):
 
     def _handle_verification(self, user, data, code):
         if data.get("phone_number"):
-            self._send_sms_verification(data["phone_number"], code)
-
             phone_verification = models.PhoneVerification.objects.create(
                 user=user,
                 phone_number=data["phone_number"],
                 code=code,
                 is_verified=False
             )
-            logger.info(f'Phone verification created for user {user.id}')
+            transaction.on_commit(lambda: self._send_sms_verification(data["phone_number"], code))
             return
 
         if data.get("email"):
@@ -135,21 +210,14 @@ class UserRegisterSerializer(serializers.Serializer):
                 code=code,
                 is_verified=False
             )
-            logger.info(f'Email verification created for user {user.id}')
             return
         
     def _send_sms_verification(self, phone_number, code):
-        if services.send_sms(phone_number, code):
-            logger.info(f'SMS sent to {phone_number} with code {code}')
-        else:
-            logger.error(f'Failed to send SMS to {phone_number}')
-            raise exceptions.VerificationCodeSentFailure(f'Failed to send SMS to {phone_number}')
+        send_verification_sms(phone_number, code)
 
     def _send_email_verification(self, email, code):
-        if services.send_email([email], code):
-            logger.info(f'Email sent to {email} with code {code}')
-        else:
-            logger.error(f'Failed to send email to {email}')
+        if not services.send_email([email], code):
+            logger.error('Failed to send email to %s', email)
             raise exceptions.VerificationCodeSentFailure(f'Failed to send email to {email}')
 
 
@@ -161,6 +229,9 @@ class UserRegistrationVerifyPhoneSerializer(serializers.Serializer):
     phone_number = serializers.CharField(required=True)
     code = serializers.CharField(required=True, max_length=6)
 
+    def validate_phone_number(self, value):
+        return canonical_phone_number(value)
+
     def validate(self, attrs):
         """Validate phone number and verification code."""
         phone_number = attrs.get('phone_number')
@@ -171,18 +242,18 @@ class UserRegistrationVerifyPhoneSerializer(serializers.Serializer):
             raise serializers.ValidationError({'non_field_errors': 'Phone number and code are required.'})
 
         try:
-            phone_verification = models.PhoneVerification.objects.get(phone_number=phone_number, code=code)
+            phone_verification = models.PhoneVerification.objects.select_related('user').get(phone_number=phone_number, code=code)
         except models.PhoneVerification.DoesNotExist:
-            logger.warning(f'Invalid phone verification attempt for number: {phone_number}')
+            logger.warning('Invalid phone verification attempt for number: %s', phone_number)
             raise serializers.ValidationError({'non_field_errors': 'Invalid phone number or code.'})
 
         if phone_verification.is_verified:
-            logger.info(f'Attempted verification of already verified phone number: {phone_number}')
+            logger.info('Attempted verification of already verified phone number: %s', phone_number)
             raise serializers.ValidationError({'phone_number': 'This phone number is already verified.'})
 
-        expiration_time = timezone.now() - timedelta(minutes=int(env.get('PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES', 10)))
+        expiration_time = timezone.now() - timedelta(minutes=settings.PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES)
         if phone_verification.created_at < expiration_time:
-            logger.warning(f'Expired verification code used for phone number: {phone_number}')
+            logger.warning('Expired verification code used for phone number: %s', phone_number)
             raise serializers.ValidationError({'code': 'The verification code has expired.'})
 
         attrs['phone_verification'] = phone_verification
@@ -192,8 +263,8 @@ class UserRegistrationVerifyPhoneSerializer(serializers.Serializer):
         """Confirm phone number verification."""
         phone_verification = validated_data['phone_verification']
         phone_verification.is_verified = True
+        # PhoneVerification.save logs phone.verified
         phone_verification.save()
-        logger.info(f'Phone number verified successfully for user {phone_verification.user.id}')
         return phone_verification
 
 
@@ -201,6 +272,9 @@ class UserRegistrationResendPhoneVerificationSerializer(serializers.Serializer):
     """Serializer for resending a phone verification code."""
     phone_number = serializers.CharField(required=True)
 
+    def validate_phone_number(self, value):
+        return canonical_phone_number(value)
+
     def validate(self, attrs):
         """Validate phone number for resending verification code."""
         phone_number = attrs.get('phone_number')
@@ -210,13 +284,13 @@ class UserRegistrationResendPhoneVerificationSerializer(serializers.Serializer):
             raise serializers.ValidationError({'phone_number': 'Phone number is required.'})
 
         try:
-            phone_verification = models.PhoneVerification.objects.get(phone_number=phone_number)
+            phone_verification = models.PhoneVerification.objects.select_related('user').get(phone_number=phone_number)
         except models.PhoneVerification.DoesNotExist:
-            logger.warning(f'Resend verification attempt for unregistered phone number: {phone_number}')
+            logger.warning('Resend verification attempt for unregistered phone number: %s', phone_number)
             raise serializers.ValidationError({'phone_number': 'This phone number is not registered.'})
 
         if phone_verification.is_verified:
-            logger.info(f'Attempted resend verification for already verified number: {phone_number}')
+            logger.info('Attempted resend verification for already verified number: %s', phone_number)
             raise serializers.ValidationError({'phone_number': 'This phone number is already verified.'})
 
         attrs['phone_verification'] = phone_verification
@@ -226,23 +300,24 @@ class UserRegistrationResendPhoneVerificationSerializer(serializers.Serializer):
         """Resend a phone verification code."""
         phone_number = validated_data['phone_number']
         phone_verification = validated_data['phone_verification']
+        user = phone_verification.user
         phone_verification.delete()
 
-        try:
-            user = models.CustomUser.objects.get(phone_number=phone_number)
-            verification_code = models.PhoneVerification.gen_code()
-            new_phone_verification = models.PhoneVerification.objects.create(
-                user=user,
-                phone_number=phone_number,
-                code=verification_code,
-                is_verified=False
-            )
-            services.send_sms(phone_number, verification_code)
-            logger.info(f'New verification code sent to phone number for user {user.id}')
-            return user
-        except models.CustomUser.DoesNotExist:
-            logger.error(f'User not found for phone number: {phone_number}')
-            raise serializers.ValidationError({'phone_number': 'User with this phone number not found.'})
+        verification_code = models.PhoneVerification.gen_code()
+        models.PhoneVerification.objects.create(
+            user=user,
+            phone_number=phone_number,
+            code=verification_code,
+            is_verified=False
+        )
+        transaction.on_commit(lambda: send_verification_sms(phone_number, verification_code))
+        log_event(
+            'verification.resent',
+            'New verification code sent to phone number for user %s',
+            user.id,
+            user_id=user.id
+        )
+        return user
         
         
 class UserRegistrationVerifyEmailSerializer(serializers.Serializer):
@@ -250,6 +325,9 @@ class UserRegistrationVerifyEmailSerializer(serializers.Serializer):
     email = serializers.EmailField(required=True)
     code = serializers.CharField(required=True, max_length=6)
 
+    def validate_email(self, value):
+        return canonical_email(value)
+
     def validate(self, attrs):
         """Validate email and verification code."""
         email = attrs.get('email')
@@ -260,18 +338,18 @@ class UserRegistrationVerifyEmailSerializer(serializers.Serializer):
             raise serializers.ValidationError({'non_field_errors': 'Email and code are required.'})
 
         try:
-            email_verification = models.EmailVerification.objects.get(email=email, code=code)
+            email_verification = models.EmailVerification.objects.select_related('user').get(email=email, code=code)
         except models.EmailVerification.DoesNotExist:
-            logger.warning(f'Invalid phone verification attempt for number: {email}')
+            logger.warning('Invalid phone verification attempt for number: %s', email)
             raise serializers.ValidationError({'non_field_errors': 'Invalid email or code.'})
 
         if email_verification.is_verified:
-            logger.info(f'Attempted verification of already verified email: {email}')
+            logger.info('Attempted verification of already verified email: %s', email)
             raise serializers.ValidationError({'email': 'This email is already verified.'})
 
-        expiration_time = timezone.now() - timedelta(minutes=int(env.get('PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES', 10)))
+        expiration_time = timezone.now() - timedelta(minutes=settings.PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES)
         if email_verification.created_at < expiration_time:
-            logger.warning(f'Expired verification code used for email: {email}')
+            logger.warning('Expired verification code used for email: %s', email)
             raise serializers.ValidationError({'code': 'The verification code has expired.'})
 
         attrs['email_verification'] = email_verification
@@ -281,8 +359,8 @@ class UserRegistrationVerifyEmailSerializer(serializers.Serializer):
         """Confirm email verification."""
         email_verification = validated_data['email_verification']
         email_verification.is_verified = True
+        # EmailVerification.save logs email.verified
         email_verification.save()
-        logger.info(f'Email verified successfully for user {email_verification.user.id}')
         return email_verification
     
     
@@ -290,6 +368,9 @@ class UserRegistrationResendEmailVerificationSerializer(serializers.Serializer):
     """Serializer for resending a email code."""
     email = serializers.EmailField(required=True)
 
+    def validate_email(self, value):
+        return canonical_email(value)
+
     def validate(self, attrs):
         """Validate email for resending verification code."""
         email = attrs.get('email')
@@ -299,13 +380,13 @@ class UserRegistrationResendEmailVerificationSerializer(serializers.Serializer):
             raise serializers.ValidationError({'email': 'Email is required.'})
 
         try:
-            email_verification = models.EmailVerification.objects.get(email=email)
-        except models.PhoneVerification.DoesNotExist:
-            logger.warning(f'Resend verification attempt for unregistered email: {email}')
+            email_verification = models.EmailVerification.objects.select_related('user').get(email=email)
+        except models.EmailVerification.DoesNotExist:
+            logger.warning('Resend verification attempt for unregistered email: %s', email)
             raise serializers.ValidationError({'email': 'This email is not registered.'})
 
         if email_verification.is_verified:
-            logger.info(f'Attempted resend verification for already verified email: {email}')
+            logger.info('Attempted resend verification for already verified email: %s', email)
             raise serializers.ValidationError({'email': 'This email is already verified.'})
 
         attrs['email_verification'] = email_verification
@@ -315,20 +396,21 @@ class UserRegistrationResendEmailVerificationSerializer(serializers.Serializer):
         """Resend a email verification code."""
         email = validated_data['email']
         email_verification = validated_data['email_verification']
+        user = email_verification.user
         email_verification.delete()
 
-        try:
-            user = models.CustomUser.objects.get(email=email)
-            verification_code = models.EmailVerification.gen_code()
-            new_email_verification = models.EmailVerification.objects.create(
-                user=user,
-                email=email,
-                code=verification_code,
-                is_verified=False
-            )
-            services.send_email([email], verification_code)
-            logger.info(f'New verification code sent to email for user {user.id}')
-            return user
-        except models.CustomUser.DoesNotExist:
-            logger.error(f'User not found for email: {email}')
-            raise serializers.ValidationError({'email': 'User with this email not found.'})
\ No newline at end of file
+        verification_code = models.EmailVerification.gen_code()
+        models.EmailVerification.objects.create(
+            user=user,
+            email=email,
+            code=verification_code,
+            is_verified=False
+        )
+        services.send_email([email], verification_code)
+        log_event(
+            'verification.resent',
+            'New verification code sent to email for user %s',
+            user.id,
+            user_id=user.id
+        )
+        return user
\ No newline at end of file
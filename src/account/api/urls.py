@@ -1,18 +1,20 @@
 from django.urls import path
 from account.api import views
-from rest_framework_simplejwt.views import (
-    TokenRefreshView,
-    TokenVerifyView
-)
+from rest_framework_simplejwt.views import TokenVerifyView
 
 urlpatterns = [
     # users
     path('users/', views.UserListAPIView.as_view(), name='users-list'),
+    path('users/stats/', views.UserStatisticsAPIView.as_view(), name='user-stats'),
+    path('users/changes/', views.UserChangeFeedAPIView.as_view(), name='user-changes'),
     path('users/<int:id>/', views.UserDetailAPIView.as_view(), name='user-detail'),
     
+    # institutions
+    path('institutions/', views.InstitutionListAPIView.as_view(), name='institutions-list'),
+
     # token
     path('token/', views.CustomTokenObtainPairView.as_view(), name='token-obtain-pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('token/refresh/', views.CustomTokenRefreshView.as_view(), name='token-refresh'),
     path('token/verify/', TokenVerifyView.as_view(), name='token-verify'),
     
     # registration
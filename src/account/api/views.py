@@ -1,29 +1,56 @@
-from os import environ as env
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.views import TokenObtainPairView
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_yasg.utils import swagger_auto_schema
-from dotenv import load_dotenv
 from account.api import serializers
-from account.models import CustomUser
+from account.api.pagination import change_feed_page
+from account.stats import get_user_stats
+from account.models import CustomUser, Institution
 from auth.logging_config import logger
+from auth.idempotency import IDEMPOTENCY_HEADER, idempotent
+from auth.openapi import LazyParameters
 
-
-load_dotenv()
+IDEMPOTENCY_KEY_PARAMETERS = LazyParameters(lambda openapi: [
+    openapi.Parameter(
+        IDEMPOTENCY_HEADER,
+        openapi.IN_HEADER,
+        description="Optional key; retries with the same key replay the first response.",
+        type=openapi.TYPE_STRING,
+    ),
+])
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = serializers.CustomTokenObtainPairSerializer
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = serializers.CustomTokenRefreshSerializer
     
     
 class UserListAPIView(APIView):
     """API endpoint to retrieve a list of all users."""
 
+    @swagger_auto_schema(
+        manual_parameters=LazyParameters(lambda openapi: [
+            openapi.Parameter('institution', openapi.IN_QUERY, description="Only users of this institution id.", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('role', openapi.IN_QUERY, description="Only users with this role.", type=openapi.TYPE_STRING, enum=[role for role, _ in CustomUser.ROLE_CHOICES]),
+        ]),
+        responses={200: serializers.UsersListSerializer(many=True), 400: "Bad Request"},
+        tags=['users']
+    )
     def get(self, request):
         """Handle GET requests to list all users."""
+        filters = serializers.UserListFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
         try:
-            users = CustomUser.objects.all()
+            # Served by the (institution, role, -id) index when filtered
+            users = CustomUser.objects.select_related('institution').filter(**filters.validated_data)
             serializer = serializers.UsersListSerializer(users, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Exception as e:
@@ -32,13 +59,39 @@ class UserListAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class UserChangeFeedAPIView(APIView):
+    """API endpoint to page through users in the order they last changed."""
+
+    @swagger_auto_schema(
+        manual_parameters=LazyParameters(lambda openapi: [
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="next_cursor from the previous page; omit to start from the beginning.", type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Page size, capped by the server.", type=openapi.TYPE_INTEGER),
+        ]),
+        responses={200: serializers.UserChangeSerializer(many=True), 400: "Bad Request"},
+        operation_description="Users ordered by (updated_at, id), deactivated users included. Store next_cursor and pass it back to receive only later changes.",
+        tags=['users']
+    )
+    def get(self, request):
+        """Handle GET requests for a page of user changes."""
+        users, next_cursor, has_more = change_feed_page(
+            CustomUser.objects.select_related('institution'),
+            cursor=request.query_params.get('cursor'),
+            limit=request.query_params.get('limit'),
+        )
+        return Response({
+            "results": serializers.UserChangeSerializer(users, many=True).data,
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        }, status=status.HTTP_200_OK)
+
+
 class UserDetailAPIView(APIView):
     """API endpoint to retrieve a detail of user."""
 
     def get(self, request, id):
         """Handle GET requests to get detail of user."""
         try:
-            user = CustomUser.objects.filter(id=id).first()
+            user = CustomUser.objects.select_related('institution').filter(id=id).first()
             if not user:
                 return Response(
                     {"detail": "User not found"},
@@ -53,6 +106,52 @@ class UserDetailAPIView(APIView):
             )
 
 
+class UserStatisticsAPIView(APIView):
+    """API endpoint for precomputed user counts."""
+
+    @swagger_auto_schema(
+        responses={200: "User counts by role, institution and verification status", 304: "Not Modified"},
+        operation_description=(
+            "Counts refreshed periodically by a background task; refreshed_at tells their age. "
+            "Responses carry ETag and Last-Modified and may be cached for the refresh interval."
+        ),
+        tags=['users']
+    )
+    def get(self, request):
+        """Handle GET requests for user statistics."""
+        stats = get_user_stats()
+        etag = quote_etag(str(int(stats.refreshed_at.timestamp())))
+        last_modified = int(stats.refreshed_at.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response({**stats.data, "refreshed_at": stats.refreshed_at}, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, public=True, max_age=settings.USER_STATS_REFRESH_SECONDS)
+        return response
+
+
+class InstitutionListAPIView(APIView):
+    """API endpoint to list institutions, optionally by name prefix."""
+
+    @swagger_auto_schema(
+        manual_parameters=LazyParameters(lambda openapi: [
+            openapi.Parameter('search', openapi.IN_QUERY, description="Case-insensitive name prefix.", type=openapi.TYPE_STRING),
+        ]),
+        responses={200: serializers.InstitutionSerializer(many=True)},
+        tags=['institutions']
+    )
+    def get(self, request):
+        """Handle GET requests to list institutions."""
+        institutions = Institution.objects.all()
+        search = request.query_params.get('search', '')
+        if search.strip():
+            # A prefix of the unique normalized name can use its index
+            institutions = institutions.filter(normalized_name__startswith=Institution.normalize_name(search))
+        serializer = serializers.InstitutionSerializer(institutions, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 class UserRegisterAPIView(APIView):
     """API endpoint for user registration via email or phone number."""
 
@@ -64,8 +163,10 @@ class UserRegisterAPIView(APIView):
             500: "Internal Server Error",
         },
         operation_description="Register a new user with email or phone number. Sends a verification code if phone number is provided.",
+        manual_parameters=IDEMPOTENCY_KEY_PARAMETERS,
         tags=['registration']
     )
+    @idempotent
     def post(self, request):
         """Handle POST requests to register a new user."""
         serializer = serializers.UserRegisterSerializer(data=request.data)
@@ -74,7 +175,7 @@ class UserRegisterAPIView(APIView):
                 serializer.save()
                 response_data = {
                     "detail": "Verification code sent successfully",
-                    "expiration_time_in_minutes": int(env.get('PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES', 10)),
+                    "expiration_time_in_minutes": settings.PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES,
                 }
                 return Response(response_data, status=status.HTTP_201_CREATED)
             except Exception as e:
@@ -127,8 +228,10 @@ class UserRegistrationResendVerificationPhoneAPIView(APIView):
             500: "Internal Server Error",
         },
         operation_description="Resend a verification code to an unverified phone number.",
+        manual_parameters=IDEMPOTENCY_KEY_PARAMETERS,
         tags=['verification-phone']
     )
+    @idempotent
     def post(self, request):
         """Handle POST requests to resend a phone verification code."""
         serializer = serializers.UserRegistrationResendPhoneVerificationSerializer(data=request.data)
@@ -137,12 +240,12 @@ class UserRegistrationResendVerificationPhoneAPIView(APIView):
                 user = serializer.save()
                 response_data = {
                     "detail": "Verification code resent successfully",
-                    "expiration_time_in_minutes": int(env.get('PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES', 10))
+                    "expiration_time_in_minutes": settings.PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES
                 }
-                logger.info(f"Successfully resent verification code")
+                logger.info("Successfully resent verification code")
                 return Response(response_data, status=status.HTTP_201_CREATED)
             except Exception as e:
-                logger.error(f"Error resending verification code: {str(e)}")
+                logger.error("Error resending verification code: %s", e)
                 return Response(
                     {"detail": f"Error resending verification code: {str(e)}"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -203,12 +306,12 @@ class UserRegistrationResendVerificationEmailAPIView(APIView):
                 user = serializer.save()
                 response_data = {
                     "detail": "Verification code resent successfully",
-                    "expiration_time_in_minutes": int(env.get('PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES', 10))
+                    "expiration_time_in_minutes": settings.PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES
                 }
-                logger.info(f"Successfully resent verification code")
+                logger.info("Successfully resent verification code")
                 return Response(response_data, status=status.HTTP_201_CREATED)
             except Exception as e:
-                logger.error(f"Error resending verification code: {str(e)}")
+                logger.error("Error resending verification code: %s", e)
                 return Response(
                     {"detail": f"Error resending verification code: {str(e)}"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AccountConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'account'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from auth.db_pool import log_pool_stats
+
+        request_finished.connect(log_pool_stats, dispatch_uid='auth.db_pool.log_pool_stats')
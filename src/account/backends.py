@@ -4,13 +4,18 @@ from account.models import CustomUser
 class EmailOrPhoneAuthenticationBackend(BaseBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         username = username or kwargs.get('phone_number') or kwargs.get('email')
+        if not username:
+            return None
+        # Identifiers are stored canonically, so one unique index probe finds the user
+        if '@' in username:
+            lookup = {'email': CustomUser.objects.normalize_email(username)}
+        else:
+            lookup = {'phone_number': CustomUser.objects.normalize_phone_number(username)}
         try:
-            user = CustomUser.objects.get(email=username)
+            # The institution is read for the token's profile claims
+            user = CustomUser.objects.select_related('institution').get(**lookup)
         except CustomUser.DoesNotExist:
-            try:
-                user = CustomUser.objects.get(phone_number=username)
-            except CustomUser.DoesNotExist:
-                return None
+            return None
 
         if not user.check_password(password):
             return None
@@ -0,0 +1,134 @@
+"""
+User change events for services that cache user data.
+
+Every committed change to a user publishes a compact JSON message on the
+USER_EVENTS_CHANNEL Redis pub/sub channel:
+
+    {"id": 42, "fields": ["email", "is_active"], "version": 7}
+
+``fields`` is null when the whole record should be treated as new. Changes
+made inside one transaction are coalesced into a single event per user and
+sent from an on_commit hook, so rolled back work is never announced.
+"""
+import json
+import threading
+import time
+import weakref
+from functools import lru_cache
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from auth.logging_config import logger
+
+# Bookkeeping columns that change on every write and are implied by ``version``
+IGNORED_FIELDS = frozenset({'updated_at', 'profile_version'})
+
+
+@lru_cache(maxsize=None)
+def get_redis():
+    import redis
+
+    # Publishing runs inline after commit in autocommit requests, so Redis must not stall them
+    timeout = settings.USER_EVENTS_REDIS_TIMEOUT_SECONDS
+    return redis.Redis.from_url(settings.USER_EVENTS_REDIS_URL, socket_connect_timeout=timeout, socket_timeout=timeout)
+
+
+class ChangeBatch:
+    """on_commit callback holding the coalesced changes of one transaction."""
+
+    def __init__(self):
+        self.changes = {}
+        self.sent = False
+
+    def add(self, user_id, fields, version):
+        known_fields, known_version = self.changes.get(user_id, (set(), 0))
+        if fields is None or known_fields is None:
+            fields = None
+        else:
+            fields = known_fields | (set(fields) - IGNORED_FIELDS)
+        self.changes[user_id] = (fields, max(version, known_version))
+
+    def __call__(self):
+        self.sent = True
+        publish(self.changes)
+
+
+# Per thread and database alias, a weak reference to the batch queued with
+# on_commit. Only Django's callback list holds the batch strongly, so when a
+# rollback discards the callback the batch is freed and the reference dies.
+_batches = threading.local()
+
+
+def current_batch(using):
+    ref = getattr(_batches, 'refs', {}).get(using)
+    batch = ref() if ref is not None else None
+    if batch is None or batch.sent:
+        return None
+    return batch
+
+
+def record_user_change(user_id, fields, version, using=DEFAULT_DB_ALIAS):
+    """Queue an event for ``user_id``; ``fields=None`` means the whole record."""
+    if not settings.USER_EVENTS_ENABLED:
+        return
+    batch = current_batch(using)
+    if batch is not None:
+        batch.add(user_id, fields, version)
+        return
+    batch = ChangeBatch()
+    batch.add(user_id, fields, version)
+    if not hasattr(_batches, 'refs'):
+        _batches.refs = {}
+    _batches.refs[using] = weakref.ref(batch)
+    transaction.on_commit(batch, using=using)
+
+
+def encode_event(user_id, fields, version):
+    return json.dumps(
+        {'id': user_id, 'fields': sorted(fields) if fields is not None else None, 'version': version},
+        separators=(',', ':'),
+    )
+
+
+def decode_event(data):
+    return json.loads(data)
+
+
+# monotonic time before which publishing is skipped after a Redis failure
+_suspended_until = 0.0
+
+
+def publish(changes):
+    """
+    Publish one message per user; failures are logged, the commit already happened.
+
+    After a failure publishing is skipped for USER_EVENTS_RETRY_SECONDS, so an
+    unreachable Redis costs one timeout rather than one per write.
+    """
+    global _suspended_until
+    if not changes or time.monotonic() < _suspended_until:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for user_id, (fields, version) in changes.items():
+            pipe.publish(settings.USER_EVENTS_CHANNEL, encode_event(user_id, fields, version))
+        pipe.execute()
+    except Exception:
+        _suspended_until = time.monotonic() + settings.USER_EVENTS_RETRY_SECONDS
+        logger.warning('Could not publish %d user change events', len(changes), exc_info=True)
+
+
+def listen(client=None, channel=None):
+    """
+    Yield decoded change events as they arrive; blocks between messages.
+
+    Pub/sub does not replay missed messages, so subscribers that reconnect
+    should drop their cache or catch up through users/changes/.
+    """
+    pubsub = (client or get_redis()).pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel or settings.USER_EVENTS_CHANNEL)
+    try:
+        for message in pubsub.listen():
+            if message.get('type') == 'message':
+                yield decode_event(message['data'])
+    finally:
+        pubsub.close()
@@ -0,0 +1,22 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from auth.openapi import generate_schema
+
+
+class Command(BaseCommand):
+    help = 'Write the OpenAPI schema to OPENAPI_SCHEMA_DIR as swagger.json and swagger.yaml; run before collectstatic.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=str(settings.OPENAPI_SCHEMA_DIR), help='Directory to write the schema to.')
+
+    def handle(self, *args, **options):
+        from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+
+        schema = generate_schema()
+        os.makedirs(options['output_dir'], exist_ok=True)
+        for name, codec in (('swagger.json', OpenAPICodecJson), ('swagger.yaml', OpenAPICodecYaml)):
+            path = os.path.join(options['output_dir'], name)
+            with open(path, 'wb') as output:
+                output.write(codec(validators=[]).encode(schema))
+            self.stdout.write(f'Wrote {path}')
@@ -0,0 +1,90 @@
+import json
+import os
+import subprocess
+import sys
+from django.core.management.base import BaseCommand, CommandError
+
+# Code that reproduces the cold start of each process type
+TARGETS = {
+    'wsgi': (
+        "import auth.wsgi\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns\n"
+    ),
+    'asgi': (
+        "import auth.asgi\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns\n"
+    ),
+    'celery': (
+        "import django\n"
+        "django.setup()\n"
+        "from auth.celery import app\n"
+        "app.loader.import_default_modules()\n"
+    ),
+}
+
+
+def parse_importtime(output):
+    """Return ``{module: (self_us, cumulative_us)}`` from ``-X importtime`` output."""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        modules[module.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Report -X importtime totals for the WSGI app, the ASGI app and the Celery worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help=f'Any of {", ".join(TARGETS)}; all by default.')
+        parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to show.')
+        parser.add_argument('--budget-ms', type=float, help='Fail if any target takes longer to import.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def measure(self, target):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', TARGETS[target]],
+            capture_output=True,
+            text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'auth.settings')},
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Importing {target} failed:\n{result.stderr[-2000:]}')
+        return parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        targets = options['targets'] or list(TARGETS)
+        unknown = set(targets) - set(TARGETS)
+        if unknown:
+            raise CommandError(f'Unknown targets: {", ".join(sorted(unknown))}')
+
+        report = {}
+        for target in targets:
+            modules = self.measure(target)
+            slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+            report[target] = {
+                'total_ms': round(sum(self_us for self_us, _ in modules.values()) / 1000, 1),
+                'modules': len(modules),
+                'slowest': [
+                    {'module': module, 'cumulative_ms': round(cumulative_us / 1000, 1)}
+                    for module, (_, cumulative_us) in slowest[:options['top']]
+                ],
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            for target, data in report.items():
+                self.stdout.write(f"{target}: {data['total_ms']} ms, {data['modules']} modules")
+                for entry in data['slowest']:
+                    self.stdout.write(f"  {entry['cumulative_ms']:>8} ms  {entry['module']}")
+
+        budget = options['budget_ms']
+        if budget is not None:
+            over = [target for target, data in report.items() if data['total_ms'] > budget]
+            if over:
+                raise CommandError(f'Import time over {budget} ms budget: {", ".join(over)}')
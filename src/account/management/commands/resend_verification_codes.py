@@ -0,0 +1,133 @@
+import json
+import os
+import time
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from account import tasks
+from account.models import CustomUser, EmailVerification, PhoneVerification
+
+CHANNELS = {
+    # channel: (verification model, address field, user flag)
+    'phone': (PhoneVerification, 'phone_number', 'is_phone_verified'),
+    'email': (EmailVerification, 'email', 'is_email_verified'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Issue new verification codes to unverified users and queue their delivery on the bulk queue. '
+        'Users are processed in id order, one batch per send_verification_codes task, paced to --rate '
+        'so codes are generated shortly before they are sent.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--channel', choices=sorted(CHANNELS), default='phone')
+        parser.add_argument('--role', choices=[role for role, _ in CustomUser.ROLE_CHOICES])
+        parser.add_argument('--institution', type=int, help='Only users of this institution id.')
+        parser.add_argument('--registered-after', type=datetime.fromisoformat, help='ISO date or datetime.')
+        parser.add_argument('--registered-before', type=datetime.fromisoformat, help='ISO date or datetime.')
+        parser.add_argument('--include-inactive', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=settings.SMS_BATCH_SIZE)
+        parser.add_argument(
+            '--rate', type=int, default=settings.VERIFICATION_RESEND_RATE_PER_MINUTE,
+            help='Codes dispatched per minute; 0 disables pacing.'
+        )
+        parser.add_argument('--after-id', type=int, default=0, help='Start after this user id.')
+        parser.add_argument(
+            '--checkpoint',
+            help='JSON file holding the last dispatched user id; read on start, rewritten after every batch.'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report the selection without writing or sending.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        channel = options['channel']
+        users = self.select_users(options)
+        last_id = max(options['after_id'], self.read_checkpoint(options['checkpoint']))
+        total = users.filter(id__gt=last_id).count()
+        self.stdout.write(f'{total} unverified users on {channel} after id {last_id}')
+
+        done = 0
+        while True:
+            started = time.monotonic()
+            batch = list(users.filter(id__gt=last_id).order_by('id')[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            done += len(batch)
+            if options['dry_run']:
+                self.stdout.write(f'{done}/{total} users would get a new code, last id {last_id}')
+                continue
+
+            recipients = self.issue_codes(channel, batch)
+            if recipients:
+                tasks.send_verification_codes.delay(channel, recipients)
+            # A batch queued before an interruption may be queued again on resume; the newer code wins
+            self.write_checkpoint(options['checkpoint'], last_id)
+            self.stdout.write(f'{done}/{total} users, {len(recipients)} codes queued, last id {last_id}')
+            if options['rate']:
+                time.sleep(max(0, len(recipients) * 60 / options['rate'] - (time.monotonic() - started)))
+
+        self.stdout.write(self.style.SUCCESS(f'Done, last id {last_id}'))
+
+    def select_users(self, options):
+        _, address, verified_flag = CHANNELS[options['channel']]
+        users = CustomUser.objects.filter(**{verified_flag: False, f'{address}__isnull': False})
+        if not options['include_inactive']:
+            users = users.filter(is_active=True)
+        if options['role']:
+            users = users.filter(role=options['role'])
+        if options['institution']:
+            users = users.filter(institution_id=options['institution'])
+        for option, lookup in (('registered_after', 'created_at__gte'), ('registered_before', 'created_at__lt')):
+            if options[option]:
+                moment = options[option]
+                if timezone.is_naive(moment):
+                    moment = timezone.make_aware(moment)
+                users = users.filter(**{lookup: moment})
+        return users.only('id', address)
+
+    def issue_codes(self, channel, users):
+        """Regenerate or create the verification rows of ``users``; returns [(address, code), ...]."""
+        model, address, _ = CHANNELS[channel]
+        now = timezone.now()
+        by_address = {getattr(user, address): user for user in users}
+        with transaction.atomic():
+            existing = {
+                getattr(verification, address): verification
+                for verification in model.objects.select_for_update().filter(**{f'{address}__in': list(by_address)})
+            }
+            updated, created, recipients = [], [], []
+            for value, user in by_address.items():
+                verification = existing.get(value)
+                if verification is not None and verification.is_verified:
+                    continue
+                code = model.gen_code()
+                if verification is None:
+                    created.append(model(user=user, code=code, is_verified=False, **{address: value}))
+                else:
+                    verification.code = code
+                    # Codes expire relative to created_at, so a reissued code starts a new window
+                    verification.created_at = now
+                    updated.append(verification)
+                recipients.append((value, code))
+            model.objects.bulk_update(updated, ['code', 'created_at'])
+            model.objects.bulk_create(created)
+        return recipients
+
+    def read_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path) as checkpoint:
+            return json.load(checkpoint)['last_id']
+
+    def write_checkpoint(self, path, last_id):
+        if not path:
+            return
+        with open(f'{path}.tmp', 'w') as checkpoint:
+            json.dump({'last_id': last_id}, checkpoint)
+        os.replace(f'{path}.tmp', path)
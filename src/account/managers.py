@@ -1,7 +1,72 @@
+import re
+from django.conf import settings
 from django.contrib.auth.models import BaseUserManager
-from auth.logging_config import logger
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+from account.events import record_user_change
+from auth.logging_config import log_event
+
+E164_RE = re.compile(r'^\+[1-9]\d{7,14}$')
+_PHONE_SEPARATORS_RE = re.compile(r'[\s\-().]')
+
+
+class CustomUserQuerySet(models.QuerySet):
+    # Rows per chunk when a bulk update has to announce the users it touched
+    event_chunk_size = 1000
+
+    def update(self, **kwargs):
+        """Bulk update that bumps updated_at and profile_version and announces the change."""
+        kwargs.setdefault('updated_at', timezone.now())
+        kwargs.setdefault('profile_version', F('profile_version') + 1)
+        if not settings.USER_EVENTS_ENABLED:
+            return super().update(**kwargs)
+
+        # Updated in primary key chunks so no more than one chunk of ids is held at a time
+        rows = self.model._base_manager.using(self.db)
+        updated = 0
+        last_pk = None
+        with transaction.atomic(using=self.db):
+            while True:
+                pending = self.order_by('pk') if last_pk is None else self.filter(pk__gt=last_pk).order_by('pk')
+                pks = list(pending.values_list('pk', flat=True)[:self.event_chunk_size])
+                if not pks:
+                    return updated
+                updated += rows.filter(pk__in=pks).update(**kwargs)
+                for pk, version in rows.filter(pk__in=pks).values_list('pk', 'profile_version'):
+                    record_user_change(pk, kwargs, version, using=self.db)
+                last_pk = pks[-1]
+
+
+class CustomUserManager(BaseUserManager.from_queryset(CustomUserQuerySet)):
+    @classmethod
+    def normalize_email(cls, email):
+        """Canonical email: trimmed and lowercased as a whole."""
+        return (email or '').strip().lower()
+
+    @classmethod
+    def normalize_phone_number(cls, phone_number):
+        """
+        Canonical E.164 form, e.g. '8 (65) 00-00-02' -> '+99365000002'.
+
+        Numbers without a country code get PHONE_NUMBER_DEFAULT_COUNTRY_CODE.
+        Values that cannot be read as a number are returned with separators
+        removed; check the result with E164_RE where it has to be valid.
+        """
+        number = _PHONE_SEPARATORS_RE.sub('', phone_number or '')
+        if number.startswith('00'):
+            number = '+' + number[2:]
+        if number.startswith('+') or not number.isdigit():
+            return number
+
+        country_code = settings.PHONE_NUMBER_DEFAULT_COUNTRY_CODE
+        if len(number) > 9:
+            # Longer than a national number (8 digits, 9 with the trunk prefix)
+            return '+' + number
+        if len(number) == 9 and number.startswith('8'):
+            number = number[1:]
+        return f'+{country_code}{number}'
 
-class CustomUserManager(BaseUserManager):
     def create_user(self, email=None, phone_number=None, password=None, **extra_fields):
         if not email and not phone_number:
             raise ValueError("User must have either an email or phone number")
@@ -10,21 +75,13 @@ class CustomUserManager(BaseUserManager):
             raise ValueError("User must have either an email or phone number, not both")
         
         if email:
-            email = self.normalize_email(email)
-            extra_fields['email'] = email
+            extra_fields['email'] = self.normalize_email(email)
+        if phone_number:
+            phone_number = self.normalize_phone_number(phone_number)
 
         user = self.model(phone_number=phone_number, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
-
-        logger.info(
-            'User created through manager',
-            extra={
-                'user_id': user.id,
-                'email': user.email,
-                'phone_number': user.phone_number
-            }
-        )
         return user
 
     def create_superuser(self, email=None, password=None, **extra_fields):
@@ -34,12 +91,11 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault('is_phone_verified', True)
         user = self.create_user(email=email, password=password, **extra_fields)
         
-        logger.info(
+        log_event(
+            'user.superuser_created',
             'Superuser created',
-            extra={
-                'user_id': user.id,
-                'email': user.email,
-                'phone_number': user.phone_number
-            }
+            user_id=user.id,
+            email=user.email,
+            phone_number=user.phone_number
         )
         return user
@@ -0,0 +1,100 @@
+import re
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+# Frozen copies of CustomUserManager.normalize_email / normalize_phone_number as
+# of this migration, so later changes to the manager or settings do not alter it
+DEFAULT_COUNTRY_CODE = '993'
+_PHONE_SEPARATORS_RE = re.compile(r'[\s\-().]')
+
+
+def canonical_email(value):
+    return (value or '').strip().lower()
+
+
+def canonical_phone_number(value):
+    number = _PHONE_SEPARATORS_RE.sub('', value or '')
+    if number.startswith('00'):
+        number = '+' + number[2:]
+    if number.startswith('+') or not number.isdigit():
+        return number
+    if len(number) > 9:
+        return '+' + number
+    if len(number) == 9 and number.startswith('8'):
+        number = number[1:]
+    return f'+{DEFAULT_COUNTRY_CODE}{number}'
+
+
+def normalize_email(value):
+    return canonical_email(value) or None
+
+
+def normalize_phone_number(value):
+    return canonical_phone_number(value) or None
+
+
+def backfill(model, fields):
+    """Rewrite ``fields`` to their canonical form in primary key batches."""
+    last_pk = 0
+    while True:
+        batch = list(
+            model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', *fields)[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        changed = []
+        for obj in batch:
+            updated = False
+            for field, normalize in fields.items():
+                value = getattr(obj, field)
+                canonical = normalize(value)
+                if canonical != value:
+                    setattr(obj, field, canonical)
+                    updated = True
+            if updated:
+                changed.append(obj)
+        if changed:
+            model.objects.bulk_update(changed, list(fields))
+        last_pk = batch[-1].pk
+
+
+def find_collisions(model, fields):
+    """Values of ``fields`` that would be equal once canonical, as {canonical: [pk, ...]}."""
+    collisions = {}
+    for field, normalize in fields.items():
+        seen = {}
+        for pk, value in model.objects.exclude(**{f'{field}__isnull': True}).values_list('pk', field).iterator():
+            seen.setdefault(normalize(value), []).append(pk)
+        collisions.update({canonical: pks for canonical, pks in seen.items() if canonical and len(pks) > 1})
+    return collisions
+
+
+def normalize_identifiers(apps, schema_editor):
+    targets = [
+        (apps.get_model('account', 'CustomUser'), {'email': normalize_email, 'phone_number': normalize_phone_number}),
+        (apps.get_model('account', 'PhoneVerification'), {'phone_number': canonical_phone_number}),
+        (apps.get_model('account', 'EmailVerification'), {'email': canonical_email}),
+    ]
+    for model, fields in targets:
+        collisions = find_collisions(model, fields)
+        if collisions:
+            raise RuntimeError(
+                f'{model._meta.db_table} has rows that only differ in spelling and must be merged '
+                f'before migrating: {collisions}'
+            )
+    for model, fields in targets:
+        backfill(model, fields)
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own, so a large table is not locked for the whole backfill
+    atomic = False
+
+    dependencies = [
+        ('account', '0007_rename_roles_customuser_role'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_identifiers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-19 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0009_customuser_email_lower_uniq'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', 'is_active', '-id'], name='user_role_active_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emailverification',
+            index=models.Index(fields=['is_verified', '-id'], name='email_verif_verified_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phoneverification',
+            index=models.Index(fields=['is_verified', '-id'], name='phone_verif_verified_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0010_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0011_customuser_profile_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['updated_at', 'id'], name='user_updated_at_id_idx'),
+        ),
+    ]
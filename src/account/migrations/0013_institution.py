@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0012_customuser_updated_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Institution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('normalized_name', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Institution',
+                'verbose_name_plural': 'Institutions',
+                'db_table': 'institution',
+                'ordering': ['normalized_name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='institution',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='account.institution'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+from collections import Counter
+from django.db import migrations
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+
+
+def clean(name):
+    return ' '.join((name or '').split())
+
+
+def normalize_name(name):
+    return clean(name).casefold()
+
+
+def create_institutions(Institution, CustomUser):
+    """One Institution per spelling group, named after its most common spelling."""
+    spellings = {}
+    counts = (
+        CustomUser.objects.exclude(educational_institution__isnull=True)
+        .values_list('educational_institution').annotate(count=Count('pk')).order_by()
+    )
+    for name, count in counts.iterator():
+        if clean(name):
+            spellings.setdefault(normalize_name(name), Counter())[clean(name)] += count
+    existing = set(Institution.objects.values_list('normalized_name', flat=True))
+    Institution.objects.bulk_create(
+        [
+            Institution(name=names.most_common(1)[0][0], normalized_name=normalized)
+            for normalized, names in spellings.items() if normalized not in existing
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    return dict(Institution.objects.values_list('normalized_name', 'pk'))
+
+
+def link_users(apps, schema_editor):
+    Institution = apps.get_model('account', 'Institution')
+    CustomUser = apps.get_model('account', 'CustomUser')
+    institution_ids = create_institutions(Institution, CustomUser)
+
+    last_pk = 0
+    while True:
+        batch = list(
+            CustomUser.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'educational_institution')[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        changed = []
+        for user in batch:
+            institution_id = institution_ids.get(normalize_name(user.educational_institution))
+            if institution_id:
+                user.institution_id = institution_id
+                changed.append(user)
+        if changed:
+            CustomUser.objects.bulk_update(changed, ['institution'])
+        last_pk = batch[-1].pk
+
+
+def unlink_users(apps, schema_editor):
+    CustomUser = apps.get_model('account', 'CustomUser')
+    last_pk = 0
+    while True:
+        batch = list(
+            CustomUser.objects.filter(pk__gt=last_pk).order_by('pk').select_related('institution')[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        for user in batch:
+            user.educational_institution = user.institution.name if user.institution_id else None
+        CustomUser.objects.bulk_update(batch, ['educational_institution'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own, so a large table is not locked for the whole backfill
+    atomic = False
+
+    dependencies = [
+        ('account', '0013_institution'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_users, unlink_users),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0014_backfill_institutions'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='educational_institution',
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['institution', 'role', '-id'], name='user_institution_role_id_idx'),
+        ),
+    ]
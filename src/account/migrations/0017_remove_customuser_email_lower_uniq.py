@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 18:01
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0016_userstatistics'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='customuser',
+            name='user_email_lower_uniq',
+        ),
+    ]
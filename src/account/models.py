@@ -1,15 +1,54 @@
 from django.db import models
 from django.contrib.auth.models import PermissionsMixin, AbstractBaseUser
 from account.managers import CustomUserManager
-from auth.logging_config import logger
+from account.events import record_user_change
+from auth.logging_config import log_event
 import random
 
 
+class InstitutionManager(models.Manager):
+    def get_for_name(self, name):
+        """Institution matching ``name`` in any spelling variant, created on first use."""
+        name = ' '.join((name or '').split())
+        if not name:
+            return None
+        institution, _ = self.get_or_create(normalized_name=Institution.normalize_name(name), defaults={'name': name})
+        return institution
+
+
+class Institution(models.Model):
+    name = models.CharField(max_length=100)
+    # Case and whitespace variants of a name share one row
+    normalized_name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = InstitutionManager()
+
+    class Meta:
+        db_table = 'institution'
+        verbose_name = 'Institution'
+        verbose_name_plural = 'Institutions'
+        ordering = ['normalized_name']
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def normalize_name(name):
+        return ' '.join(name.split()).casefold()
+
+    def save(self, *args, **kwargs):
+        self.name = ' '.join(self.name.split())
+        self.normalized_name = self.normalize_name(self.name)
+        super().save(*args, **kwargs)
+
+
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     ROLE_CHOICES = (
         ('teacher', 'Teacher'),
         ('student', 'Student'),
     )
+    # Stored lowercased by save(), so the plain unique index also rejects case variants
     email = models.EmailField(unique=True, null=True, blank=True)
     phone_number = models.CharField(max_length=20, unique=True, null=True, blank=True)
     first_name = models.CharField(max_length=50, blank=True, null=True)
@@ -17,34 +56,78 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_email_verified = models.BooleanField(default=False)
     is_phone_verified = models.BooleanField(default=False)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='teacher')
-    educational_institution = models.CharField(max_length=100, blank=True, null=True)
+    # Indexed together with role below, so no separate foreign key index
+    institution = models.ForeignKey(
+        Institution, on_delete=models.SET_NULL, null=True, blank=True, related_name='users', db_index=False
+    )
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped on every update; issued tokens carry it so clients can tell a stale profile
+    profile_version = models.PositiveIntegerField(default=1)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Loaded values let save() announce only the fields that changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return
+        deferred = self.get_deferred_fields()
+        for field in self._meta.concrete_fields:
+            if field.attname not in deferred and (fields is None or field.name in fields or field.attname in fields):
+                loaded[field.attname] = getattr(self, field.attname)
+
+    def changed_fields(self):
+        """Fields whose value differs from the loaded row; None when nothing was loaded."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return {name for name, value in loaded.items() if getattr(self, name) != value}
 
     def save(self, *args, **kwargs):
+        # Lookups compare canonical forms, so every write stores them
+        self.email = CustomUserManager.normalize_email(self.email) or None
+        self.phone_number = CustomUserManager.normalize_phone_number(self.phone_number) or None
         is_new = self._state.adding
+        if not is_new:
+            self.profile_version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'profile_version'}
         super().save(*args, **kwargs)
 
+        fields = None if is_new else kwargs.get('update_fields') or self.changed_fields()
+        record_user_change(self.id, fields, self.profile_version, using=self._state.db)
+        saved = kwargs.get('update_fields') or [f.name for f in self._meta.concrete_fields]
+        self._loaded_values = getattr(self, '_loaded_values', {})
+        for name in saved:
+            attname = self._meta.get_field(name).attname
+            self._loaded_values[attname] = getattr(self, attname)
+
         if is_new:
-            logger.info(
+            log_event(
+                'user.created',
                 'New user created',
-                extra={
-                    'user_id': self.id,
-                    'email': self.email,
-                    'phone_number': self.phone_number
-                }
+                dedupe_key=self.id,
+                user_id=self.id,
+                email=self.email,
+                phone_number=self.phone_number
             )
         else:
-            logger.info(
+            log_event(
+                'user.updated',
                 'User updated',
-                extra={
-                    'user_id': self.id,
-                    'email': self.email,
-                    'phone_number': self.phone_number
-                }
+                dedupe_key=self.id,
+                user_id=self.id,
+                email=self.email,
+                phone_number=self.phone_number
             )
 
     objects = CustomUserManager()
@@ -63,6 +146,14 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         verbose_name = 'User'
         verbose_name_plural = 'Users'
         ordering = ['-id']
+        # Serve the admin filters together with its newest-first ordering
+        indexes = [
+            models.Index(fields=['role', 'is_active', '-id'], name='user_role_active_id_idx'),
+            # Keyset order of the users/changes/ feed
+            models.Index(fields=['updated_at', 'id'], name='user_updated_at_id_idx'),
+            # Users of an institution, optionally by role, newest first
+            models.Index(fields=['institution', 'role', '-id'], name='user_institution_role_id_idx'),
+        ]
     
     
 class PhoneVerification(models.Model):
@@ -77,33 +168,36 @@ class PhoneVerification(models.Model):
         verbose_name = 'Phone Verification'
         verbose_name_plural = 'Phone Verifications'
         ordering = ['-id']
+        indexes = [
+            models.Index(fields=['is_verified', '-id'], name='phone_verif_verified_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.phone_number} - {'Verified' if self.is_verified else 'Not Verified'}"
 
 
     def save(self, *args, **kwargs):
+        self.phone_number = CustomUserManager.normalize_phone_number(self.phone_number)
         is_new = self._state.adding
         super().save(*args, **kwargs)
 
         if is_new:
-            logger.info(
+            log_event(
+                'verification.created',
                 'New phone verification created',
-                extra={
-                    'user_id': self.user.id,
-                    'phone_number': self.phone_number
-                }
+                user_id=self.user_id,
+                phone_number=self.phone_number
             )
 
         if self.is_verified and not self.user.is_phone_verified:
             self.user.is_phone_verified = True
-            self.user.save()
-            logger.info(
+            self.user.save(update_fields=['is_phone_verified', 'updated_at'])
+            log_event(
+                'phone.verified',
                 'Phone number verified successfully',
-                extra={
-                    'user_id': self.user.id,
-                    'phone_number': self.phone_number
-                }
+                dedupe_key=self.user_id,
+                user_id=self.user_id,
+                phone_number=self.phone_number
             )
 
     @staticmethod
@@ -123,35 +217,52 @@ class EmailVerification(models.Model):
         verbose_name = 'Email Verification'
         verbose_name_plural = 'Email Verifications'
         ordering = ['-id']
+        indexes = [
+            models.Index(fields=['is_verified', '-id'], name='email_verif_verified_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.email} - {'Verified' if self.is_verified else 'Not Verified'}"
 
 
     def save(self, *args, **kwargs):
+        self.email = CustomUserManager.normalize_email(self.email)
         is_new = self._state.adding
         super().save(*args, **kwargs)
 
         if is_new:
-            logger.info(
+            log_event(
+                'verification.created',
                 'New email verification created',
-                extra={
-                    'user_id': self.user.id,
-                    'email': self.email
-                }
+                user_id=self.user_id,
+                email=self.email
             )
 
         if self.is_verified and not self.user.is_email_verified:
             self.user.is_email_verified = True
-            self.user.save()
-            logger.info(
+            self.user.save(update_fields=['is_email_verified', 'updated_at'])
+            log_event(
+                'email.verified',
                 'Email verified successfully',
-                extra={
-                    'user_id': self.user.id,
-                    'email': self.email
-                }
+                dedupe_key=self.user_id,
+                user_id=self.user_id,
+                email=self.email
             )
 
     @staticmethod
     def gen_code():
-        return str(random.randint(100000, 999999))
\ No newline at end of file
+        return str(random.randint(100000, 999999))
+
+
+class UserStatistics(models.Model):
+    """Precomputed user counts served by users/stats/; see account/stats.py."""
+    data = models.JSONField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'user_statistics'
+        verbose_name = 'User Statistics'
+        verbose_name_plural = 'User Statistics'
+
+    def __str__(self):
+        return f"User statistics at {self.refreshed_at:%Y-%m-%d %H:%M}"
@@ -1,53 +1,87 @@
 from django.core.mail import EmailMessage
 from django.conf import settings
-from os import environ as env
-from dotenv import load_dotenv
 import requests
-from auth.logging_config import logger
-
-load_dotenv()
-
-ZENDER_API_KEY = env['ZENDER_API_KEY']
-ZENDER_SENDER_ID = env['ZENDER_SENDER_ID']
-ZENDER_BASE_URL = "https://salebot.demo.zoomnearby.com/api"
+from auth.logging_config import logger, log_event
+from auth.metrics import track_gateway
+from auth.timing import timed
 
 
+@track_gateway('sms')
+@timed('sms')
 def send_sms(phone_number: str, code: str) -> bool:
     try:
         data = {
-            "secret": ZENDER_API_KEY,
+            "secret": settings.ZENDER_API_KEY,
             "mode": "devices",
             "phone": phone_number,
             "message": f"Your verification code is: {code}",
             "sim": 1,
-            "device": ZENDER_SENDER_ID
+            "device": settings.ZENDER_SENDER_ID
         }
 
         response = requests.post(
-            f'{ZENDER_BASE_URL}/send/sms',
+            f'{settings.ZENDER_BASE_URL}/send/sms',
             data=data,
             verify=False
         )
 
-        logger.info(f"SMS sending response: status={response.status_code}, body={response.text}")
+        if response.status_code != 200:
+            logger.warning('HTTP error while sending SMS: %s', response.status_code)
+            return False
+
+        response_data = response.json()
+        if response_data.get('status') != 200:
+            logger.error('Zender API error: %s', response_data.get('message', 'Unknown error'))
+            return False
+
+        log_event('sms.sent', 'SMS successfully sent to %s', phone_number, phone_number=phone_number)
+        return True
+
+    except requests.exceptions.RequestException as e:
+        logger.exception('RequestException while sending SMS via Zender: %s', e)
+        return False
+
+
+@track_gateway('sms')
+@timed('sms')
+def send_bulk_sms(phone_numbers: list[str], message: str) -> bool:
+    """Send one message to several numbers in a single Zender bulk call."""
+    try:
+        data = {
+            "secret": settings.ZENDER_API_KEY,
+            "mode": "devices",
+            "campaign": "bulk",
+            "numbers": ",".join(phone_numbers),
+            "message": message,
+            "sim": 1,
+            "device": settings.ZENDER_SENDER_ID
+        }
+
+        response = requests.post(
+            f'{settings.ZENDER_BASE_URL}/send/sms.bulk',
+            data=data,
+            verify=False
+        )
 
         if response.status_code != 200:
-            logger.warning(f"HTTP error while sending SMS: {response.status_code}")
+            logger.warning('HTTP error while sending bulk SMS: %s', response.status_code)
             return False
 
         response_data = response.json()
         if response_data.get('status') != 200:
-            logger.error(f"Zender API error: {response_data.get('message', 'Unknown error')}")
+            logger.error('Zender API error: %s', response_data.get('message', 'Unknown error'))
             return False
 
-        logger.info(f"SMS successfully sent to {phone_number}")
+        log_event('sms.sent', 'Bulk SMS sent to %s numbers', len(phone_numbers), recipients=len(phone_numbers))
         return True
 
     except requests.exceptions.RequestException as e:
-        logger.exception(f"RequestException while sending SMS via Zender: {str(e)}")
+        logger.exception('RequestException while sending bulk SMS via Zender: %s', e)
         return False
 
 
+@track_gateway('email')
+@timed('email')
 def send_email(to: list[str], code: str) -> bool:
     try:
         email = EmailMessage(
@@ -57,8 +91,8 @@ def send_email(to: list[str], code: str) -> bool:
             to=to
         )
         email.send(fail_silently=False)
-        logger.info(f"Email successfully sent to: {to}")
+        log_event('email.sent', 'Email successfully sent to: %s', to)
         return True
     except Exception as e:
-        logger.exception(f"Error sending email: {e}")
+        logger.exception('Error sending email: %s', e)
         return False
@@ -0,0 +1,58 @@
+"""
+User statistics for dashboards, served from a precomputed summary row.
+
+refresh_user_stats() aggregates the user table in a handful of GROUP BY
+queries and stores the result in the single UserStatistics row; the periodic
+account.tasks.refresh_user_stats task keeps it current. Reading the stats is
+one primary key lookup whatever the number of users.
+"""
+from django.db.models import Count, Q
+from django.utils import timezone
+from account.models import CustomUser, UserStatistics
+
+SNAPSHOT_PK = 1
+
+
+def compute_user_stats():
+    users = CustomUser.objects.order_by()
+    totals = users.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+        phone_verified=Count('id', filter=Q(is_phone_verified=True)),
+        email_verified=Count('id', filter=Q(is_email_verified=True)),
+        unverified=Count('id', filter=Q(is_phone_verified=False, is_email_verified=False)),
+    )
+    by_institution = (
+        users.filter(institution__isnull=False)
+        .values('institution_id', 'institution__name')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'institution_id')
+    )
+    return {
+        'total': totals['total'],
+        'active': totals['active'],
+        'inactive': totals['total'] - totals['active'],
+        'by_role': dict(users.values_list('role').annotate(count=Count('id'))),
+        'by_verification': {
+            'phone_verified': totals['phone_verified'],
+            'email_verified': totals['email_verified'],
+            'unverified': totals['unverified'],
+        },
+        'by_institution': [
+            {'id': row['institution_id'], 'name': row['institution__name'], 'count': row['count']}
+            for row in by_institution
+        ],
+    }
+
+
+def refresh_user_stats():
+    stats, _ = UserStatistics.objects.update_or_create(
+        pk=SNAPSHOT_PK,
+        defaults={'data': compute_user_stats(), 'refreshed_at': timezone.now()},
+    )
+    return stats
+
+
+def get_user_stats():
+    """The stored snapshot; computed on the spot only before the first refresh."""
+    return UserStatistics.objects.filter(pk=SNAPSHOT_PK).first() or refresh_user_stats()
@@ -1,10 +1,77 @@
+from datetime import timedelta
 from celery import shared_task
-from account import services
+from django.conf import settings
+from django.utils import timezone
+from account import services, stats
+from account.models import EmailVerification, PhoneVerification
+from account.managers import CustomUserManager
+from auth.logging_config import logger
+
+# Queues, priorities and acks are configured in settings (CELERY_TASK_ROUTES)
+
+
+# This and the other sending tasks ack on receipt, overriding CELERY_TASK_ACKS_LATE:
+# a task redelivered after a worker crash would otherwise send paid SMS a second time
+@shared_task(bind=True, acks_late=False, max_retries=3, default_retry_delay=5)
+def send_sms_async(self, phone_number, code):
+    """Interactive verification code, routed to the high priority otp queue."""
+    if not services.send_sms(phone_number, code):
+        raise self.retry()
+
+
+@shared_task(acks_late=False)
+def send_sms_batch(phone_numbers, message):
+    """One gateway call for a batch of campaign recipients."""
+    if not services.send_bulk_sms(phone_numbers, message):
+        logger.error('Bulk SMS batch of %s numbers failed', len(phone_numbers))
+
+
+@shared_task(acks_late=False)
+def send_verification_codes(channel, recipients):
+    """Deliver a batch of per-user codes, [(address, code), ...], by 'phone' or 'email'."""
+    if channel == 'phone':
+        failed = [address for address, code in recipients if not services.send_sms(address, code)]
+    else:
+        failed = [address for address, code in recipients if not services.send_email([address], code)]
+    if failed:
+        logger.error('%s of %s verification codes failed to send', len(failed), len(recipients))
+
+
+def queue_campaign_sms(phone_numbers, message):
+    """
+    Queue ``message`` for every number on the bulk queue.
+
+    Recipients are de-duplicated by their canonical form and coalesced into
+    send_sms_batch tasks of SMS_BATCH_SIZE numbers, so a campaign costs one
+    task and one gateway call per batch instead of one per number. Returns the
+    number of batches queued.
+    """
+    recipients = list(dict.fromkeys(
+        CustomUserManager.normalize_phone_number(phone_number) for phone_number in phone_numbers
+    ))
+    batch_size = settings.SMS_BATCH_SIZE
+    for start in range(0, len(recipients), batch_size):
+        send_sms_batch.delay(recipients[start:start + batch_size], message)
+    return -(-len(recipients) // batch_size)
+
+
+@shared_task
+def cleanup_verified_verifications(batch_size=1000):
+    """Delete verification codes confirmed more than VERIFICATION_RETENTION_DAYS ago."""
+    cutoff = timezone.now() - timedelta(days=settings.VERIFICATION_RETENTION_DAYS)
+    deleted = 0
+    for model in (PhoneVerification, EmailVerification):
+        while True:
+            ids = list(
+                model.objects.filter(is_verified=True, created_at__lt=cutoff).values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted += model.objects.filter(pk__in=ids).delete()[0]
+    logger.info('Deleted %s verified verification codes', deleted)
+
 
 @shared_task
-def send_sms_async(phone_number, code):
-    try:
-        services.send_sms(phone_number, code)
-        return f"SMS sent to {phone_number} with code {code}"
-    except Exception as e:
-        return str(e)
+def refresh_user_stats():
+    """Recompute the summary row behind users/stats/."""
+    stats.refresh_user_stats()
@@ -1,3 +1,1098 @@
-from django.test import TestCase
+import io
+import importlib
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import logging
+import re
+import difflib
+import tracemalloc
+from datetime import datetime
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import IntegrityError
+from account.models import CustomUser, Institution, PhoneVerification, EmailVerification
+from account.managers import CustomUserManager
+from account import events, stats, tasks
+from rest_framework_simplejwt.tokens import AccessToken
+from auth.logging_config import logger, log_event, CustomJsonFormatter, FastJsonFormatter
+from auth.middleware import ReplicaPinningMiddleware
+from auth.profiling import ProfilingMiddleware, make_profile_token
+from auth import db_router, db_pool, health, metrics, parsers, renderers
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.core.management import call_command
+from account.management.commands.importtime_report import parse_importtime
 
-# Create your tests here.
+# Tests run without collectstatic, so there is no manifest to resolve hashed names from
+UNHASHED_STATIC_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class LogEventTests(TestCase):
+    @override_settings(LOG_EVENTS={'test.sampled': {'sample_rate': 0.0}})
+    def test_sampled_out_event_is_not_logged(self):
+        with self.assertNoLogs(logger, level='INFO'):
+            self.assertFalse(log_event('test.sampled', 'Sampled out'))
+
+    @override_settings(LOG_EVENTS={'test.deduped': {'dedupe_seconds': 60}})
+    def test_repeated_event_is_deduplicated_per_key(self):
+        with self.assertLogs(logger, level='INFO') as logs:
+            self.assertTrue(log_event('test.deduped', 'User %s created', 1, dedupe_key=1))
+            self.assertFalse(log_event('test.deduped', 'User %s created', 1, dedupe_key=1))
+            self.assertTrue(log_event('test.deduped', 'User %s created', 2, dedupe_key=2))
+
+        self.assertEqual([record.getMessage() for record in logs.records], ['User 1 created', 'User 2 created'])
+        self.assertEqual(logs.records[0].event, 'test.deduped')
+
+    @override_settings(LOG_EVENTS={})
+    def test_verification_is_logged_once(self):
+        user = CustomUser.objects.create_user(phone_number='+99365400601', password='secret-pass')
+        PhoneVerification.objects.create(user=user, phone_number='+99365400601', code='123456')
+
+        with self.assertLogs(logger, level='INFO') as logs:
+            response = self.client.post('/api/v1/registration/verify-phone/', {'phone_number': '+99365400601', 'code': '123456'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([getattr(record, 'event', None) for record in logs.records].count('phone.verified'), 1)
+
+    def test_message_is_not_formatted_below_logger_level(self):
+        class Unformattable:
+            def __str__(self):
+                raise AssertionError('formatted eagerly')
+
+        self.assertFalse(log_event('test.debug', 'Value %s', Unformattable(), level=10))
+
+
+class FastJsonFormatterTests(TestCase):
+    def make_record(self):
+        record = logging.LogRecord('paytoleg', logging.INFO, '/app/account/views.py', 42, 'User %s updated', (7,), None, func='post')
+        record.user_id = 7
+        record.request_id = 'abc'
+        return record
+
+    def test_fields_match_custom_json_formatter(self):
+        record = self.make_record()
+        legacy = json.loads(CustomJsonFormatter(
+            '%(timestamp)s %(level)s %(name)s %(module)s %(funcName)s %(lineNo)d %(message)s'
+        ).format(record))
+        fast = json.loads(FastJsonFormatter().format(record))
+
+        self.assertEqual(list(fast), list(legacy))
+        legacy.pop('timestamp')
+        self.assertEqual(fast.pop('timestamp'), datetime.fromtimestamp(record.created).isoformat(timespec='microseconds'))
+        self.assertEqual(fast, legacy)
+
+    def test_exception_is_included(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = logging.LogRecord('paytoleg', logging.ERROR, __file__, 1, 'failed', (), sys.exc_info())
+
+        self.assertIn('ValueError: boom', json.loads(FastJsonFormatter().format(record))['exc_info'])
+
+
+class FastJSONTests(TestCase):
+    def test_renderer_output_matches_drf(self):
+        from datetime import timezone
+        from decimal import Decimal
+        from uuid import UUID
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.utils.serializer_helpers import ReturnList
+
+        moment = datetime(2026, 10, 19, 17, 15, 3, 123456, tzinfo=timezone.utc)
+        data = ReturnList([{
+            'id': 1, 'name': 'Ayna Örazowa \u2028 "q"\n\x01', 'active': True, 'none': None,
+            'at': moment, 'naive': moment.replace(tzinfo=None, microsecond=0), 'date': moment.date(), 'time': moment.time(),
+            'amount': Decimal('12.50'), 'label': gettext_lazy('User'), 'uuid': UUID(int=7), 'tags': ('a', 'b'),
+        }], serializer=None)
+
+        for payload in (data, {'big': 2 ** 70}, [], {'nested': {'list': [1, [2, {'x': moment}]]}}):
+            self.assertEqual(renderers.FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertEqual(renderers.FastJSONRenderer().render(data, 'application/json; indent=2'), JSONRenderer().render(data, 'application/json; indent=2'))
+
+    def test_parser_matches_drf(self):
+        from io import BytesIO
+        from rest_framework.exceptions import ParseError
+        from rest_framework.parsers import JSONParser
+
+        for body in (b'{"phone_number": "+99365400001", "n": [1, 2.5, null]}', '{"name": "Ö"}'.encode(), b'123456789012345678901234567890'):
+            self.assertEqual(parsers.FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        for body in (b'{"a": ', b'{"a": NaN}', b'\xff'):
+            errors = []
+            for parser in (parsers.FastJSONParser(), JSONParser()):
+                with self.assertRaises(ParseError) as raised:
+                    parser.parse(BytesIO(body))
+                errors.append(str(raised.exception))
+            self.assertEqual(errors[0], errors[1])
+
+
+@override_settings(METRICS_TOKEN='scrape-token', METRICS_ALLOWED_NETWORKS=['10.0.0.0/8'])
+class MetricsEndpointTests(TestCase):
+    databases = '__all__'
+
+    def test_request_latency_is_exposed_per_route(self):
+        self.client.get('/api/v1/users/')
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",route="api/v1/users/",status="200"}',
+            response.content.decode()
+        )
+        self.assertIn('http_request_db_queries_bucket{le="1.0",route="api/v1/users/"}', response.content.decode())
+
+    def test_scrapers_need_the_token_or_an_allowed_address(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+
+    def test_failure_streaks_survive_concurrent_calls(self):
+        failing = metrics.track_gateway('test')(lambda: False)
+        self.addCleanup(metrics.GATEWAY_FAILURE_STREAKS.pop, 'test', None)
+        threads = [threading.Thread(target=lambda: [failing() for _ in range(200)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(metrics.gateway_failure_streak('test'), 1600)
+
+
+class IdentifierNormalizationTests(TestCase):
+    def test_phone_numbers_are_normalized_to_e164(self):
+        for written in ('+993 65 00-00-02', '0099365000002', '99365000002', '865000002', '65000002'):
+            self.assertEqual(CustomUserManager.normalize_phone_number(written), '+99365000002', written)
+
+    @override_settings(PHONE_NUMBER_DEFAULT_COUNTRY_CODE='7')
+    def test_backfill_migration_keeps_its_own_country_code(self):
+        migration = importlib.import_module('account.migrations.0008_normalize_identifiers')
+
+        self.assertEqual(migration.canonical_phone_number('865000002'), '+99365000002')
+        self.assertEqual(migration.canonical_email(' Teacher@Example.COM '), 'teacher@example.com')
+
+    def test_identifiers_are_stored_canonically_and_unique(self):
+        user = CustomUser.objects.create_user(email=' Teacher@Example.COM ', password='secret-pass')
+        self.assertEqual(user.email, 'teacher@example.com')
+
+        with self.assertRaises(IntegrityError):
+            CustomUser.objects.bulk_create([CustomUser(email='teacher@example.com')])
+
+    def test_login_accepts_differently_written_identifiers(self):
+        CustomUser.objects.create_user(phone_number='865000003', password='secret-pass', is_phone_verified=True)
+        CustomUser.objects.create_user(email='Student@Example.com', password='secret-pass', is_email_verified=True)
+
+        for username in ('+993 65 00 00 03', 'student@EXAMPLE.com'):
+            response = self.client.post('/api/v1/token/', {'phone_number': username, 'password': 'secret-pass'})
+            self.assertEqual(response.status_code, 200, username)
+
+
+class ServerTimingTests(TestCase):
+    @override_settings(SERVER_TIMING_ENABLED=True, SERVER_TIMING_HEADER=True)
+    def test_token_request_reports_db_and_hashing_time(self):
+        CustomUser.objects.create_user(phone_number='+99365000001', password='secret-pass', is_phone_verified=True)
+
+        with self.assertLogs(logger, level='INFO') as logs:
+            response = self.client.post('/api/v1/token/', {'phone_number': '+99365000001', 'password': 'secret-pass'})
+
+        self.assertEqual(response.status_code, 200)
+        phases = [part.split(';')[0] for part in response['Server-Timing'].split(', ')]
+        self.assertEqual(phases, ['db', 'hash', 'total'])
+        finished = [record for record in logs.records if record.getMessage() == 'Request finished'][0]
+        self.assertEqual(finished.timings['hash_count'], 1)
+
+    def test_header_is_not_sent_when_disabled(self):
+        response = self.client.get('/api/v1/users/')
+
+        self.assertNotIn('Server-Timing', response)
+
+
+class HealthEndpointTests(TestCase):
+    databases = '__all__'
+
+    def test_healthz_does_no_io(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/healthz')
+
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_readyz_shares_cached_result_between_probes(self):
+        calls = []
+        probe = health.ReadinessProbe({'database': health.check_databases, 'broker': lambda: calls.append(1)})
+
+        with mock.patch.object(health, 'readiness', probe):
+            responses = [self.client.get('/readyz') for _ in range(3)]
+
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200])
+        self.assertEqual(responses[0].json()['checks'], {'database': 'ok', 'broker': 'ok'})
+        self.assertEqual(len(calls), 1)
+
+    @override_settings(SMS_CIRCUIT_FAILURE_THRESHOLD=2)
+    def test_readyz_fails_when_sms_circuit_is_open(self):
+        probe = health.ReadinessProbe({'sms': health.check_sms_circuit})
+        failing_sms = metrics.track_gateway('sms')(lambda: False)
+        self.addCleanup(metrics.GATEWAY_FAILURE_STREAKS.pop, 'sms', None)
+        failing_sms()
+        failing_sms()
+
+        with mock.patch.object(health, 'readiness', probe):
+            response = self.client.get('/readyz')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'unavailable')
+
+
+class RouteAwareMiddlewareTests(TestCase):
+    databases = '__all__'
+
+    def test_api_routes_skip_session_and_clickjacking_middleware(self):
+        response = self.client.get('/api/v1/users/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Frame-Options', response)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+
+    @override_settings(STORAGES=UNHASHED_STATIC_STORAGES)
+    def test_admin_keeps_full_middleware_stack(self):
+        response = self.client.get('/admin/login/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertIn('csrftoken', response.cookies)
+
+
+class OpenAPISchemaTests(TestCase):
+    def test_command_writes_json_and_yaml_schema(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+
+        call_command('generate_openapi_schema', output_dir=output_dir, stdout=open(os.devnull, 'w'))
+
+        with open(os.path.join(output_dir, 'swagger.json')) as schema_file:
+            schema = json.load(schema_file)
+        self.assertEqual(schema['info']['title'], 'Emugallym Auth Service')
+        self.assertIn('/users/', schema['paths'])
+        self.assertTrue(os.path.exists(os.path.join(output_dir, 'swagger.yaml')))
+        parameters = schema['paths']['/registration/']['post']['parameters']
+        self.assertIn('Idempotency-Key', [parameter['name'] for parameter in parameters])
+
+    @override_settings(OPENAPI_STATIC_SCHEMA=True, STORAGES=UNHASHED_STATIC_STORAGES)
+    def test_schema_request_redirects_to_static_file(self):
+        response = self.client.get('/swagger/?format=openapi')
+
+        self.assertRedirects(response, '/static/openapi/swagger.json', fetch_redirect_response=False)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+
+    def test_signed_header_writes_report_keyed_by_request_id(self):
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.profile_dir):
+            response = self.client.get('/api/v1/users/', HTTP_X_PROFILE=make_profile_token())
+
+        request_id = response.wsgi_request.request_id
+        self.assertEqual(sorted(os.listdir(self.profile_dir)), [f'{request_id}.prof', f'{request_id}.txt'])
+        with open(os.path.join(self.profile_dir, f'{request_id}.txt')) as report:
+            self.assertIn('FROM "user"', report.read())
+
+    def test_invalid_header_is_ignored(self):
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.profile_dir):
+            self.client.get('/api/v1/users/', HTTP_X_PROFILE='profile:forged:signature')
+
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_concurrent_requests_take_one_sample_per_interval(self):
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.profile_dir,
+                           PROFILING_SAMPLE_RATE=1.0, PROFILING_MIN_INTERVAL_SECONDS=60):
+            middleware = ProfilingMiddleware(lambda request: None)
+        request = RequestFactory().get('/api/v1/users/')
+        barrier = threading.Barrier(8)
+        sampled = []
+
+        def worker():
+            barrier.wait()
+            sampled.append(middleware.should_profile(request))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sampled.count(True), 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class PrimaryReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = db_router.PrimaryReplicaRouter()
+
+    def test_user_reads_go_to_replica_inside_unpinned_request(self):
+        token = db_router.start_request(pinned=False)
+        try:
+            self.assertEqual(self.router.db_for_read(CustomUser), 'replica')
+        finally:
+            db_router.finish_request(token)
+
+    def test_reads_stay_on_primary_after_a_write(self):
+        token = db_router.start_request(pinned=False)
+        try:
+            self.router.db_for_write(CustomUser)
+            self.assertEqual(self.router.db_for_read(CustomUser), 'default')
+        finally:
+            self.assertTrue(db_router.finish_request(token))
+
+    def test_replicas_are_not_migrated(self):
+        self.assertIs(self.router.allow_migrate('replica', 'account'), False)
+        self.assertIsNone(self.router.allow_migrate('default', 'account'))
+
+    def test_reads_outside_request_and_of_other_models_use_primary(self):
+        self.assertEqual(self.router.db_for_read(CustomUser), 'default')
+        token = db_router.start_request(pinned=False)
+        try:
+            self.assertIsNone(self.router.db_for_read(PhoneVerification))
+        finally:
+            db_router.finish_request(token)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaPinningMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(phone_number='+99365000003', password='secret-pass')
+        self.router = db_router.PrimaryReplicaRouter()
+
+    def read_database(self, request, write=False):
+        def view(request):
+            request.user = self.user
+            if write:
+                self.router.db_for_write(CustomUser)
+            view.database = self.router.db_for_read(CustomUser)
+            return HttpResponse()
+
+        ReplicaPinningMiddleware(view)(request)
+        return view.database
+
+    def test_write_pins_the_users_reads_without_a_cookie(self):
+        request = RequestFactory().get('/api/v1/users/', headers={'Authorization': f'Bearer {AccessToken.for_user(self.user)}'})
+
+        self.assertEqual(self.read_database(request), 'replica')
+        self.read_database(RequestFactory().post('/api/v1/users/'), write=True)
+        self.assertEqual(self.read_database(request), 'default')
+
+    def test_other_users_are_not_pinned(self):
+        other = CustomUser.objects.create_user(phone_number='+99365000004', password='secret-pass')
+        db_router.pin_user(self.user.id)
+
+        request = RequestFactory().get('/api/v1/users/', headers={'Authorization': f'Bearer {AccessToken.for_user(other)}'})
+        self.assertEqual(self.read_database(request), 'replica')
+
+
+class DatabasePoolConfigTests(TestCase):
+    def test_pool_parameters_configure_psycopg_pool(self):
+        config = db_pool.database_config(
+            'postgres://user:secret@db:5432/auth?pool_min_size=2&pool_max_size=8&pool_timeout=2.5&sslmode=disable'
+        )
+
+        self.assertEqual(config['OPTIONS'], {'pool': {'min_size': 2, 'max_size': 8, 'timeout': 2.5}, 'sslmode': 'disable'})
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+    def test_url_without_pool_keeps_persistent_connections(self):
+        config = db_pool.database_config('sqlite:////tmp/auth.sqlite3', conn_max_age=600)
+
+        self.assertEqual(config['CONN_MAX_AGE'], 600)
+        self.assertNotIn('pool', config.get('OPTIONS', {}))
+
+    def test_pool_on_sqlite_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            db_pool.database_config('sqlite:////tmp/auth.sqlite3?pool=true')
+
+    def test_pool_flag_is_parsed_as_boolean(self):
+        for flag in ('false', '0', 'False'):
+            config = db_pool.database_config(f'sqlite:////tmp/auth.sqlite3?pool={flag}')
+            self.assertNotIn('pool', config.get('OPTIONS', {}), flag)
+        with self.assertRaises(ImproperlyConfigured):
+            db_pool.database_config('postgres://user:secret@db:5432/auth?pool=yes')
+
+
+HAS_SEPARATE_REPLICA = 'replica' in settings.DATABASES and not settings.DATABASES['replica'].get('TEST', {}).get('MIRROR')
+
+
+@skipUnless(HAS_SEPARATE_REPLICA, 'needs DATABASE_REPLICA_URL with DATABASE_REPLICA_TEST_MIRROR=False')
+class ReplicaRoutingIntegrationTests(TestCase):
+    databases = {'default', 'replica'} if HAS_SEPARATE_REPLICA else {'default'}
+
+    def test_user_pin_gives_read_your_writes(self):
+        user = CustomUser.objects.create_user(phone_number='+99365000002', password='secret-pass')
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+        self.assertEqual(self.client.get('/api/v1/users/', headers=headers).json(), [])
+        db_router.pin_user(user.id)
+        self.assertEqual(len(self.client.get('/api/v1/users/', headers=headers).json()), 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], USER_EVENTS_ENABLED=False)
+@mock.patch('account.tasks.send_sms_async.delay')
+class IdempotencyKeyTests(TestCase):
+    registration = {
+        'phone_number': '+99365200001', 'password1': 'secret-pass', 'password2': 'secret-pass',
+        'first_name': 'Retry', 'last_name': 'User', 'educational_institution': '',
+    }
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, path, data, key):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(path, data, content_type='application/json', headers={'Idempotency-Key': key})
+
+    def test_retried_registration_is_replayed_without_side_effects(self, send_sms):
+        first = self.post('/api/v1/registration/', self.registration, 'key-1')
+        with self.assertNumQueries(0):
+            retry = self.post('/api/v1/registration/', self.registration, 'key-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(send_sms.call_count, 1)
+
+    def test_retried_resend_does_not_send_another_sms(self, send_sms):
+        self.post('/api/v1/registration/', self.registration, 'key-2')
+        self.post('/api/v1/registration/resend-phone/', {'phone_number': '+99365200001'}, 'key-3')
+        code = PhoneVerification.objects.get().code
+
+        retry = self.post('/api/v1/registration/resend-phone/', {'phone_number': '+99365200001'}, 'key-3')
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(send_sms.call_count, 2)
+        self.assertEqual(PhoneVerification.objects.get().code, code)
+
+    def test_key_reused_with_other_body_is_rejected(self, send_sms):
+        self.post('/api/v1/registration/', self.registration, 'key-4')
+
+        response = self.post('/api/v1/registration/', {**self.registration, 'first_name': 'Other'}, 'key-4')
+
+        self.assertEqual(response.status_code, 422)
+
+
+@override_settings(STORAGES=UNHASHED_STATIC_STORAGES, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AdminChangelistTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(email='admin@example.com', password='secret-pass')
+        for index in range(3):
+            user = CustomUser.objects.create_user(phone_number=f'+9936530000{index}', password='secret-pass')
+            PhoneVerification.objects.create(user=user, phone_number=user.phone_number, code='123456')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_verification_changelist_does_not_query_per_row(self):
+        self.client.get('/admin/account/phoneverification/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/account/phoneverification/')
+        user = CustomUser.objects.create_user(phone_number='+99365300009', password='secret-pass')
+        PhoneVerification.objects.create(user=user, phone_number=user.phone_number, code='123456')
+
+        with self.assertNumQueries(len(queries)):
+            self.client.get('/admin/account/phoneverification/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_matches_canonical_identifier(self):
+        response = self.client.get('/admin/account/customuser/', {'q': '8 65 30 00 01'})
+
+        self.assertEqual([user.phone_number for user in response.context['cl'].result_list], ['+99365300001'])
+
+    def test_institution_search_is_an_indexable_prefix(self):
+        school = Institution.objects.get_for_name('School 5')
+        Institution.objects.get_for_name('Lyceum 5')
+
+        response = self.client.get('/admin/account/institution/', {'q': '  SCHOOL '})
+
+        self.assertEqual(list(response.context['cl'].result_list), [school])
+        lookup, = response.context['cl'].queryset.query.where.children
+        self.assertEqual((lookup.lookup_name, lookup.rhs), ('startswith', 'school'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TokenClaimsTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            phone_number='+99365400001', password='secret-pass', is_phone_verified=True,
+            first_name='Ayna', last_name='Orazova', institution=Institution.objects.get_for_name('School 5')
+        )
+
+    def obtain(self):
+        return self.client.post('/api/v1/token/', {'phone_number': self.user.phone_number, 'password': 'secret-pass'}).json()
+
+    def test_login_token_carries_profile_claims(self):
+        access = AccessToken(self.obtain()['access'])
+
+        self.assertEqual(access['fullname'], 'Ayna Orazova')
+        self.assertEqual(access['educational_institution'], 'School 5')
+        self.assertEqual((access['is_phone_verified'], access['is_email_verified']), (True, False))
+        self.assertEqual(access['profile_version'], self.user.profile_version)
+
+    def test_refresh_issues_current_claims(self):
+        refresh = self.obtain()['refresh']
+        self.user.institution = Institution.objects.get_for_name('School 7')
+        self.user.save()
+
+        access = AccessToken(self.client.post('/api/v1/token/refresh/', {'refresh': refresh}).json()['access'])
+
+        self.assertEqual(access['educational_institution'], 'School 7')
+        self.assertEqual(access['profile_version'], self.user.profile_version)
+
+    @override_settings(JWT_MAX_TOKEN_BYTES=330)
+    def test_claims_are_dropped_to_fit_size_budget(self):
+        with self.assertLogs(logger, level='WARNING'):
+            tokens = self.obtain()
+
+        access = AccessToken(tokens['access'])
+        self.assertLessEqual(len(tokens['refresh']), 330)
+        self.assertNotIn('educational_institution', access.payload)
+        self.assertEqual(access['role'], 'teacher')
+
+
+class InstitutionDirectoryTests(TestCase):
+    def setUp(self):
+        self.school = Institution.objects.get_for_name('School  5')
+        self.teacher = CustomUser.objects.create_user(phone_number='+99365400301', password='secret-pass', institution=self.school)
+        self.student = CustomUser.objects.create_user(
+            phone_number='+99365400302', password='secret-pass', institution=self.school, role='student'
+        )
+        CustomUser.objects.create_user(phone_number='+99365400303', password='secret-pass')
+
+    def test_spelling_variants_share_one_institution(self):
+        self.assertEqual(Institution.objects.get_for_name(' school 5 '), self.school)
+        self.assertEqual(self.school.name, 'School 5')
+        self.assertIsNone(Institution.objects.get_for_name('  '))
+
+    @mock.patch('account.tasks.send_sms_async.delay')
+    def test_registration_links_institution(self, send_sms):
+        response = self.client.post('/api/v1/registration/', {
+            'phone_number': '+99365400304', 'password1': 'secret-pass', 'password2': 'secret-pass',
+            'first_name': 'New', 'last_name': 'User', 'educational_institution': 'SCHOOL 5',
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(CustomUser.objects.get(phone_number='+99365400304').institution, self.school)
+
+    def test_users_filtered_by_institution_and_role(self):
+        users = self.client.get('/api/v1/users/', {'institution': self.school.id, 'role': 'teacher'}).json()
+
+        self.assertEqual([user['id'] for user in users], [self.teacher.id])
+        self.assertEqual((users[0]['institution'], users[0]['educational_institution']), (self.school.id, 'School 5'))
+        self.assertEqual(self.client.get('/api/v1/users/', {'role': 'principal'}).status_code, 400)
+
+    def test_institutions_searched_by_prefix(self):
+        Institution.objects.get_for_name('Lyceum 1')
+
+        found = self.client.get('/api/v1/institutions/', {'search': 'sch'}).json()
+        self.assertEqual(found, [{'id': self.school.id, 'name': 'School 5'}])
+
+
+class UserStatisticsTests(TestCase):
+    def setUp(self):
+        school = Institution.objects.get_for_name('School 5')
+        CustomUser.objects.create_user(phone_number='+99365400401', password='secret-pass', institution=school, is_phone_verified=True)
+        CustomUser.objects.create_user(phone_number='+99365400402', password='secret-pass', institution=school, role='student')
+        CustomUser.objects.create_user(email='stats@example.com', password='secret-pass', is_email_verified=True, is_active=False)
+        self.school = school
+
+    def test_refresh_counts_users(self):
+        data = stats.refresh_user_stats().data
+
+        self.assertEqual((data['total'], data['active'], data['inactive']), (3, 2, 1))
+        self.assertEqual(data['by_role'], {'teacher': 2, 'student': 1})
+        self.assertEqual(data['by_verification'], {'phone_verified': 1, 'email_verified': 1, 'unverified': 1})
+        self.assertEqual(data['by_institution'], [{'id': self.school.id, 'name': 'School 5', 'count': 2}])
+
+    def test_endpoint_serves_snapshot_until_refreshed(self):
+        stats.refresh_user_stats()
+        CustomUser.objects.create_user(phone_number='+99365400403', password='secret-pass')
+
+        response = self.client.get('/api/v1/users/stats/')
+        self.assertEqual(response.json()['total'], 3)
+        self.assertIn('max-age=%d' % settings.USER_STATS_REFRESH_SECONDS, response['Cache-Control'])
+
+        tasks.refresh_user_stats()
+        self.assertEqual(self.client.get('/api/v1/users/stats/').json()['total'], 4)
+
+    def test_conditional_request_is_not_modified(self):
+        etag = self.client.get('/api/v1/users/stats/')['ETag']
+
+        response = self.client.get('/api/v1/users/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(USER_CHANGE_FEED_SETTLE_SECONDS=0)
+class UserChangeFeedTests(TestCase):
+    def setUp(self):
+        self.users = [
+            CustomUser.objects.create_user(phone_number=f'+9936540010{i}', password='secret-pass')
+            for i in range(3)
+        ]
+
+    def page(self, **params):
+        response = self.client.get('/api/v1/users/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_through_users_in_change_order(self):
+        first = self.page(limit=2)
+        self.assertEqual([u['id'] for u in first['results']], [u.id for u in self.users[:2]])
+        self.assertTrue(first['has_more'])
+
+        second = self.page(cursor=first['next_cursor'], limit=2)
+        self.assertEqual([u['id'] for u in second['results']], [self.users[2].id])
+        self.assertFalse(second['has_more'])
+
+        idle = self.page(cursor=second['next_cursor'])
+        self.assertEqual((idle['results'], idle['next_cursor']), ([], second['next_cursor']))
+
+    def test_deactivation_appears_after_cursor(self):
+        cursor = self.page()['next_cursor']
+        self.users[0].is_active = False
+        self.users[0].save()
+
+        changes = self.page(cursor=cursor)['results']
+        self.assertEqual([(u['id'], u['is_active']) for u in changes], [(self.users[0].id, False)])
+
+    def test_rows_sharing_updated_at_are_not_skipped(self):
+        CustomUser.objects.update(updated_at=self.users[0].updated_at)
+
+        first = self.page(limit=1)
+        rest = self.page(cursor=first['next_cursor'])
+        self.assertEqual(
+            [u['id'] for u in first['results'] + rest['results']],
+            sorted(u.id for u in self.users)
+        )
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/v1/users/changes/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+
+    @override_settings(USER_CHANGE_FEED_SETTLE_SECONDS=60)
+    def test_recent_changes_wait_for_settle_window(self):
+        self.assertEqual(self.page()['results'], [])
+
+
+class FakeRedis:
+    """In-process stand-in for the pub/sub subset of redis.Redis."""
+
+    def __init__(self):
+        self.published = []
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def execute(self):
+        pass
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.channels = []
+        self.closed = False
+
+    def subscribe(self, channel):
+        self.channels.append(channel)
+
+    def listen(self):
+        for channel, message in self.redis.published:
+            if channel in self.channels:
+                yield {'type': 'message', 'channel': channel, 'data': message.encode()}
+
+    def close(self):
+        self.closed = True
+
+
+class UserChangeEventTests(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(events, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        events._suspended_until = 0.0
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = CustomUser.objects.create_user(phone_number='+99365400201', password='secret-pass')
+        self.redis.published.clear()
+
+    def received(self):
+        return [events.decode_event(message) for _, message in self.redis.published]
+
+    def test_changes_in_one_transaction_are_coalesced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Ayna'
+            self.user.save()
+            self.user.is_active = False
+            self.user.save(update_fields=['is_active'])
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.received(), [
+            {'id': self.user.id, 'fields': ['first_name', 'is_active'], 'version': self.user.profile_version},
+        ])
+
+    def test_nothing_is_published_before_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.first_name = 'Ayna'
+            self.user.save()
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.redis.published, [])
+
+    def test_bulk_update_bumps_version_and_publishes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = CustomUser.objects.create_user(phone_number='+99365400202', password='secret-pass')
+        self.redis.published.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(id__in=[self.user.id, other.id]).update(role='student')
+
+        other.refresh_from_db()
+        self.assertEqual(other.profile_version, 2)
+        self.assertCountEqual(self.received(), [
+            {'id': self.user.id, 'fields': ['role'], 'version': 2},
+            {'id': other.id, 'fields': ['role'], 'version': 2},
+        ])
+
+    def test_rolled_back_changes_are_dropped(self):
+        from django.db import transaction
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.user.first_name = 'Rolled back'
+                self.user.save()
+                raise RuntimeError
+            self.user.refresh_from_db()
+            self.user.last_name = 'Kept'
+            self.user.save()
+
+        self.assertEqual([event['fields'] for event in self.received()], [['last_name']])
+
+    def test_bulk_update_is_chunked(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            others = [CustomUser.objects.create_user(phone_number=f'+9936540021{i}', password='secret-pass') for i in range(2)]
+        self.redis.published.clear()
+
+        with mock.patch.object(CustomUser.objects._queryset_class, 'event_chunk_size', 2), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(CustomUser.objects.update(role='student'), 3)
+
+        self.assertCountEqual([event['id'] for event in self.received()], [self.user.id] + [user.id for user in others])
+
+    @override_settings(USER_EVENTS_ENABLED=False)
+    def test_bulk_update_without_events_is_one_statement(self):
+        with self.assertNumQueries(1):
+            CustomUser.objects.filter(id=self.user.id).update(role='student')
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_version, 2)
+
+    def test_publish_failure_suspends_publishing(self):
+        self.redis.execute = mock.Mock(side_effect=ConnectionError)
+        self.addCleanup(setattr, events, '_suspended_until', 0.0)
+
+        with self.assertLogs(logger, level='WARNING'):
+            events.publish({self.user.id: (None, 1)})
+        events.publish({self.user.id: (None, 2)})
+
+        self.assertEqual(self.redis.execute.call_count, 1)
+
+    def test_listen_yields_decoded_events(self):
+        events.publish({self.user.id: (None, 1)})
+
+        subscriber = events.listen(client=self.redis)
+        self.assertEqual(next(subscriber), {'id': self.user.id, 'fields': None, 'version': 1})
+        subscriber.close()
+
+
+class CeleryQueueTests(TestCase):
+    """Routing and batching against kombu's in-memory transport."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from auth.celery import app
+        cls.app = app
+        cls.broker_urls = (app.conf.broker_read_url, app.conf.broker_write_url)
+        app.conf.broker_read_url = app.conf.broker_write_url = 'memory://'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.conf.broker_read_url, cls.app.conf.broker_write_url = cls.broker_urls
+        super().tearDownClass()
+
+    def drain(self, queue):
+        with self.app.connection_for_write() as connection:
+            simple_queue = connection.SimpleQueue(queue)
+            messages = []
+            while simple_queue.qsize():
+                message = simple_queue.get(block=False)
+                message.ack()
+                messages.append(message)
+            simple_queue.close()
+        return messages
+
+    def test_tasks_are_routed_to_dedicated_queues(self):
+        router = self.app.amqp.router
+        self.assertEqual(router.route({}, 'account.tasks.send_sms_async')['queue'].name, 'otp')
+        self.assertEqual(router.route({}, 'account.tasks.send_sms_batch')['queue'].name, 'bulk')
+        self.assertEqual(router.route({}, 'account.tasks.cleanup_verified_verifications')['queue'].name, 'maintenance')
+        self.assertEqual(router.route({}, 'account.tasks.refresh_user_stats')['queue'].name, 'maintenance')
+        self.assertEqual(router.route({}, 'account.tasks.send_verification_codes')['queue'].name, 'bulk')
+
+    @override_settings(SMS_BATCH_SIZE=2)
+    def test_campaign_is_coalesced_into_batches_on_bulk_queue(self):
+        batches = tasks.queue_campaign_sms(['+99365000001', '865000001', '+99365000002', '+99365000003'], 'Hello')
+
+        messages = self.drain('bulk')
+        self.assertEqual(batches, 2)
+        self.assertEqual([message.headers['task'] for message in messages], ['account.tasks.send_sms_batch'] * 2)
+        self.assertEqual(
+            [message.decode()[0][0] for message in messages],
+            [['+99365000001', '+99365000002'], ['+99365000003']],
+        )
+        self.assertEqual(self.drain('otp'), [])
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], USER_EVENTS_ENABLED=False)
+    def test_registration_code_is_queued_on_otp_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/registration/', {
+                'phone_number': '+99365000009', 'password1': 'secret-pass', 'password2': 'secret-pass',
+                'first_name': 'New', 'last_name': 'User', 'educational_institution': '',
+            })
+
+        messages = self.drain('otp')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([message.headers['task'] for message in messages], ['account.tasks.send_sms_async'])
+        self.assertEqual(messages[0].decode()[0], ['+99365000009', PhoneVerification.objects.get().code])
+
+    def test_sending_tasks_ack_on_receipt(self):
+        for task in (tasks.send_sms_async, tasks.send_sms_batch, tasks.send_verification_codes):
+            self.assertFalse(task.acks_late, task.name)
+
+    @mock.patch('account.services.send_sms', return_value=False)
+    def test_failed_code_is_retried(self, send_sms):
+        result = tasks.send_sms_async.apply(args=('+99365000001', '123456'))
+
+        self.assertTrue(result.failed())
+        self.assertEqual(send_sms.call_count, tasks.send_sms_async.max_retries + 1)
+
+    @mock.patch('account.services.send_bulk_sms', return_value=True)
+    def test_batch_task_makes_one_gateway_call(self, send_bulk_sms):
+        result = tasks.send_sms_batch.apply(args=(['+99365000001', '+99365000002'], 'Hello'))
+
+        self.assertTrue(result.successful())
+        send_bulk_sms.assert_called_once_with(['+99365000001', '+99365000002'], 'Hello')
+
+
+class ResendVerificationCodesCommandTests(TestCase):
+    def setUp(self):
+        self.pending = CustomUser.objects.create_user(phone_number='+99365400501', password='secret-pass')
+        self.verification = PhoneVerification.objects.create(user=self.pending, phone_number='+99365400501', code='111111')
+        PhoneVerification.objects.filter(pk=self.verification.pk).update(created_at=datetime(2026, 1, 1, tzinfo=self.verification.created_at.tzinfo))
+        self.missing = CustomUser.objects.create_user(phone_number='+99365400502', password='secret-pass')
+        CustomUser.objects.create_user(phone_number='+99365400503', password='secret-pass', is_phone_verified=True)
+        patcher = mock.patch.object(tasks.send_verification_codes, 'delay')
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_command(self, *args):
+        stdout = io.StringIO()
+        with mock.patch('time.sleep') as sleep:
+            call_command('resend_verification_codes', *args, stdout=stdout)
+        return stdout.getvalue(), sleep
+
+    def test_codes_are_reissued_and_queued_in_paced_batches(self):
+        output, sleep = self.run_command('--batch-size', '1', '--rate', '60')
+
+        self.verification.refresh_from_db()
+        created = PhoneVerification.objects.get(user=self.missing)
+        self.assertNotEqual(self.verification.code, '111111')
+        self.assertEqual(self.verification.created_at.year, datetime.now().year)
+        self.assertEqual([call.args for call in self.delay.call_args_list], [
+            ('phone', [('+99365400501', self.verification.code)]),
+            ('phone', [('+99365400502', created.code)]),
+        ])
+        self.assertEqual(sleep.call_count, 2)
+        self.assertIn('2/2 users', output)
+
+    def test_dry_run_writes_nothing(self):
+        output, _ = self.run_command('--dry-run')
+
+        self.assertIn('2/2 users would get a new code', output)
+        self.assertFalse(PhoneVerification.objects.filter(user=self.missing).exists())
+        self.delay.assert_not_called()
+
+    def test_resumes_from_checkpoint(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        checkpoint = os.path.join(directory, 'resend.json')
+        with open(checkpoint, 'w') as state:
+            json.dump({'last_id': self.pending.id}, state)
+
+        self.run_command('--rate', '0', '--checkpoint', checkpoint)
+
+        self.assertEqual([call.args[1][0][0] for call in self.delay.call_args_list], ['+99365400502'])
+        with open(checkpoint) as state:
+            self.assertEqual(json.load(state), {'last_id': self.missing.id})
+
+
+class ImportTimeReportTests(TestCase):
+    def test_parse_importtime_output(self):
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |     requests.compat\n'
+            'import time:      4000 |       4120 |   requests\n'
+        )
+
+        self.assertEqual(parse_importtime(output), {'requests.compat': (120, 120), 'requests': (4000, 4120)})
+
+
+_QUERY_TABLE_RE = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+def query_shape(sql):
+    """Statement verb and first table, e.g. ``SELECT user``, stable across parameters."""
+    verb = sql.split(None, 1)[0].upper()
+    match = _QUERY_TABLE_RE.search(sql)
+    return f'{verb} {match.group(1)}' if match else verb
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+@mock.patch('account.tasks.send_sms_async.delay')
+class EndpointBudgetTests(TestCase):
+    """
+    Pins the SQL issued and the peak Python allocation of every API endpoint.
+
+    A changed query list fails with a diff of statement shapes and the full
+    SQL; if the change is intended, update the pinned list.
+    """
+    databases = '__all__'
+    password = 'secret-pass'
+
+    @classmethod
+    def setUpTestData(cls):
+        CustomUser.objects.bulk_create(
+            CustomUser(phone_number=f'+9936100{index:04d}', first_name='Seed', last_name=str(index))
+            for index in range(200)
+        )
+        cls.user = CustomUser.objects.create_user(phone_number='+99365100001', password=cls.password, is_phone_verified=True)
+        cls.pending_user = CustomUser.objects.create_user(phone_number='+99365100002', password=cls.password)
+        cls.phone_verification = PhoneVerification.objects.create(
+            user=cls.pending_user, phone_number='+99365100002', code='123456'
+        )
+        cls.email_user = CustomUser.objects.create_user(email='pending@example.com', password=cls.password)
+        cls.email_verification = EmailVerification.objects.create(
+            user=cls.email_user, email='pending@example.com', code='654321'
+        )
+
+    def setUp(self):
+        # Import-time and first-call allocations are not what is being measured
+        self.request('get', '/api/v1/users/0/')
+
+    def request(self, method, path, data=None, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            try:
+                response = getattr(self.client, method)(path, data, content_type='application/json', **extra)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return response, [query['sql'] for query in queries.captured_queries], peak
+
+    def assertBudget(self, method, path, data=None, queries=(), peak_kb=128, status=200, **extra):
+        response, sql, peak = self.request(method, path, data, **extra)
+        self.assertEqual(response.status_code, status, response.content)
+        shapes = [query_shape(statement) for statement in sql]
+        if shapes != list(queries):
+            diff = '\n'.join(difflib.unified_diff(list(queries), shapes, 'pinned', 'issued', lineterm=''))
+            self.fail(f'{method.upper()} {path} issued different queries:\n{diff}\n\nSQL:\n' + '\n'.join(sql))
+        self.assertLessEqual(peak // 1024, peak_kb, f'{method.upper()} {path} peak allocation grew')
+        return response
+
+    def access_token(self):
+        return self.client.post(
+            '/api/v1/token/', {'phone_number': self.user.phone_number, 'password': self.password}
+        ).json()
+
+    def test_users_list(self, send_sms):
+        self.assertBudget('get', '/api/v1/users/', queries=['SELECT user'], peak_kb=1536)
+
+    def test_users_of_institution(self, send_sms):
+        institution = Institution.objects.get_for_name('School 5')
+        self.assertBudget('get', '/api/v1/users/', {'institution': institution.id, 'role': 'teacher'}, queries=['SELECT user'])
+
+    def test_institutions_search(self, send_sms):
+        self.assertBudget('get', '/api/v1/institutions/', {'search': 'School'}, queries=['SELECT institution'])
+
+    def test_user_stats(self, send_sms):
+        stats.refresh_user_stats()
+        self.assertBudget('get', '/api/v1/users/stats/', queries=['SELECT user_statistics'])
+
+    @override_settings(USER_CHANGE_FEED_SETTLE_SECONDS=0)
+    def test_user_changes(self, send_sms):
+        self.assertBudget('get', '/api/v1/users/changes/', queries=['SELECT user'], peak_kb=512)
+
+    def test_user_detail(self, send_sms):
+        self.assertBudget('get', f'/api/v1/users/{self.user.id}/', queries=['SELECT user'])
+
+    def test_token_obtain(self, send_sms):
+        self.assertBudget('post', '/api/v1/token/', {'phone_number': '+993 65 10 00 01', 'password': self.password}, queries=['SELECT user'], peak_kb=768)
+
+    def test_token_refresh(self, send_sms):
+        self.assertBudget('post', '/api/v1/token/refresh/', {'refresh': self.access_token()['refresh']}, queries=['SELECT user'])
+
+    def test_token_verify(self, send_sms):
+        self.assertBudget('post', '/api/v1/token/verify/', {'token': self.access_token()['access']}, queries=[])
+
+    def test_registration_by_phone(self, send_sms):
+        self.assertBudget('post', '/api/v1/registration/', {
+            'phone_number': '+99365100009', 'password1': self.password, 'password2': self.password,
+            'first_name': 'New', 'last_name': 'User', 'educational_institution': '',
+        }, queries=['SELECT user', 'INSERT user', 'INSERT phone_verification'], status=201)
+
+    def test_verify_phone(self, send_sms):
+        self.assertBudget('post', '/api/v1/registration/verify-phone/', {
+            'phone_number': '+99365100002', 'code': '123456',
+        }, queries=['SELECT phone_verification', 'UPDATE phone_verification', 'UPDATE user'])
+
+    def test_resend_phone(self, send_sms):
+        self.assertBudget('post', '/api/v1/registration/resend-phone/', {'phone_number': '+99365100002'}, queries=[
+            'SELECT phone_verification', 'DELETE phone_verification', 'INSERT phone_verification',
+        ], status=201)
+
+    def test_verify_email(self, send_sms):
+        self.assertBudget('post', '/api/v1/registration/verify-email/', {
+            'email': 'pending@example.com', 'code': '654321',
+        }, queries=['SELECT email_verification', 'UPDATE email_verification', 'UPDATE user'])
+
+    def test_resend_email(self, send_sms):
+        self.assertBudget('post', '/api/v1/registration/resend-email/', {'email': 'pending@example.com'}, queries=[
+            'SELECT email_verification', 'DELETE email_verification', 'INSERT email_verification',
+        ], peak_kb=512, status=201)
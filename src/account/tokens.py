@@ -0,0 +1,50 @@
+"""
+Profile claims embedded in issued JWTs.
+
+JWT_PROFILE_CLAIMS selects which of PROFILE_CLAIMS go into tokens so clients
+don't have to fetch ``users/<id>/`` after login. ``token/refresh/`` re-reads
+the user, so a refreshed access token carries current values;
+``profile_version`` tells a client whether its cached profile is stale.
+Tokens larger than JWT_MAX_TOKEN_BYTES lose profile claims from the end of
+JWT_PROFILE_CLAIMS until they fit.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from auth.logging_config import logger
+
+PROFILE_CLAIMS = {
+    'role': lambda user: user.role,
+    'fullname': lambda user: user.fullname(),
+    'educational_institution': lambda user: user.institution.name if user.institution_id else None,
+    'is_phone_verified': lambda user: user.is_phone_verified,
+    'is_email_verified': lambda user: user.is_email_verified,
+    'profile_version': lambda user: user.profile_version,
+}
+
+
+def add_profile_claims(token, user):
+    for claim in settings.JWT_PROFILE_CLAIMS:
+        if claim not in PROFILE_CLAIMS:
+            raise ImproperlyConfigured(f'Unknown JWT profile claim {claim!r}; choose from {", ".join(PROFILE_CLAIMS)}')
+        token[claim] = PROFILE_CLAIMS[claim](user)
+    fit_size_budget(token)
+    return token
+
+
+def fit_size_budget(token):
+    """Drop profile claims, last configured first, until the encoded token fits."""
+    budget = settings.JWT_MAX_TOKEN_BYTES
+    dropped = []
+    claims = [claim for claim in settings.JWT_PROFILE_CLAIMS if claim in token.payload]
+    while claims and len(str(token)) > budget:
+        claim = claims.pop()
+        del token[claim]
+        dropped.append(claim)
+    if dropped:
+        logger.warning(
+            'Token over %s bytes, dropped claims %s',
+            budget,
+            ', '.join(dropped),
+            extra={'user_id': token.payload.get('user_id')}
+        )
+    return token
@@ -0,0 +1,87 @@
+"""
+Connection pooling for PostgreSQL from DATABASE_URL.
+
+Without pool parameters a URL gives the usual persistent connections
+(CONN_MAX_AGE) with CONN_HEALTH_CHECKS, so a connection that went stale
+(e.g. after a failover) is replaced instead of failing the request. With
+``?pool=true`` or any ``pool_*`` parameter the database uses Django's native
+psycopg pool instead::
+
+    postgres://user:pass@db/auth?pool_min_size=2&pool_max_size=8&pool_timeout=5
+
+The pool checks a connection before handing it out, and its stats are logged
+every DATABASE_POOL_STATS_INTERVAL seconds per worker process.
+"""
+import threading
+import time
+import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
+
+# DATABASE_URL parameter -> (psycopg_pool.ConnectionPool argument, type)
+POOL_PARAMS = {
+    'pool_min_size': ('min_size', int),
+    'pool_max_size': ('max_size', int),
+    'pool_timeout': ('timeout', float),
+    'pool_max_idle': ('max_idle', float),
+    'pool_max_lifetime': ('max_lifetime', float),
+}
+
+
+def parse_flag(param, value):
+    """Boolean URL parameter; dj_database_url may hand it over as a bool, an int or a string."""
+    flag = str(value).lower()
+    if flag in ('true', '1'):
+        return True
+    if flag in ('false', '0'):
+        return False
+    raise ImproperlyConfigured(f'DATABASE_URL parameter {param} must be true, false, 1 or 0, not {value!r}')
+
+
+def database_config(url, conn_max_age=600):
+    """Django DATABASES entry for ``url``, pooled when it asks for a pool."""
+    config = dj_database_url.parse(url, conn_max_age=conn_max_age, conn_health_checks=True)
+    options = config.get('OPTIONS', {})
+    pool = parse_flag('pool', options.pop('pool', False))
+    pool_options = {
+        name: cast(options.pop(param))
+        for param, (name, cast) in POOL_PARAMS.items()
+        if param in options
+    }
+    if not (pool or pool_options):
+        return config
+
+    if config['ENGINE'] != 'django.db.backends.postgresql':
+        raise ImproperlyConfigured(f'Connection pooling is only supported on PostgreSQL, not {config["ENGINE"]}')
+    options['pool'] = pool_options or True
+    # Connections go back to the pool at the end of each request
+    config['OPTIONS'] = options
+    config['CONN_MAX_AGE'] = 0
+    return config
+
+
+_stats_lock = threading.Lock()
+_stats_logged_at = 0.0
+
+
+def log_pool_stats(**kwargs):
+    """``request_finished`` receiver logging pool usage at most once per interval."""
+    global _stats_logged_at
+    from django.conf import settings
+
+    interval = settings.DATABASE_POOL_STATS_INTERVAL
+    if not interval or time.monotonic() - _stats_logged_at < interval:
+        return
+    with _stats_lock:
+        now = time.monotonic()
+        if now - _stats_logged_at < interval:
+            return
+        _stats_logged_at = now
+
+    from django.db import connections
+    from auth.logging_config import log_event
+
+    for connection in connections.all(initialized_only=True):
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            # pop_stats() resets the counters, so each line covers one interval
+            log_event('db.pool_stats', 'Database pool %s stats', connection.alias, alias=connection.alias, **pool.pop_stats())
@@ -0,0 +1,79 @@
+"""
+Read-replica routing for user read traffic.
+
+Inside a request, reads of the models in REPLICA_READ_MODELS go to one of
+DATABASE_REPLICAS unless the request is pinned to the primary. A request is
+pinned when it is not a safe method, once it writes, or when its user
+wrote within the last REPLICA_PIN_SECONDS (read-your-writes). The pin is
+kept in the cache per user id, since API clients do not keep cookies.
+Outside a request (Celery, management commands) everything stays on the
+primary, and replicas are never migrated.
+"""
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY_DB = 'default'
+PIN_KEY = 'replica-pin:{}'
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.written = False
+
+
+_routing_state = ContextVar('db_routing_state', default=None)
+
+
+def start_request(pinned):
+    """Begin routing for a request; returns a token for :func:`finish_request`."""
+    return _routing_state.set(RoutingState(pinned))
+
+
+def finish_request(token):
+    """End routing for a request; returns True if it wrote to the primary."""
+    state = _routing_state.get()
+    _routing_state.reset(token)
+    return state.written
+
+
+def pin_user(user_id):
+    """Send ``user_id``'s reads to the primary for REPLICA_PIN_SECONDS."""
+    cache.set(PIN_KEY.format(user_id), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def is_user_pinned(user_id):
+    return cache.get(PIN_KEY.format(user_id)) is not None
+
+
+class PrimaryReplicaRouter:
+    """Sends user reads to replicas, writes and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in settings.REPLICA_READ_MODELS:
+            return None
+        state = _routing_state.get()
+        if state is None or state.pinned or not settings.DATABASE_REPLICAS:
+            return PRIMARY_DB
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.pinned = True
+            state.written = True
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY_DB, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary, so migrate --database=replica is a no-op
+        if db in settings.DATABASE_REPLICAS and not settings.DATABASE_REPLICA_MIGRATE:
+            return False
+        return None
@@ -0,0 +1,13 @@
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from auth import timing
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2PasswordHasher that reports hashing time to the request timings.
+
+    Keeps the ``pbkdf2_sha256`` algorithm name, so existing hashes stay valid.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        with timing.measure('hash'):
+            return super().encode(password, salt, iterations)
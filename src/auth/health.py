@@ -0,0 +1,84 @@
+"""
+Liveness and readiness checks.
+
+/healthz only proves the process is serving requests and does no I/O.
+/readyz checks the databases, the Celery broker and, with
+HEALTH_CHECK_SMS_CIRCUIT, that the SMS gateway is not failing every call.
+The checks run at most once per HEALTH_CHECK_INTERVAL_SECONDS per process;
+concurrent probes share the cached result instead of hitting the
+dependencies themselves.
+"""
+import threading
+import time
+from django.conf import settings
+from django.db import connections
+from auth.logging_config import logger
+from auth.metrics import gateway_failure_streak
+
+
+def check_databases():
+    for connection in connections.all():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+def check_broker():
+    from auth.celery import app
+
+    with app.connection_for_write() as connection:
+        connection.ensure_connection(max_retries=1, timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS)
+
+
+def check_sms_circuit():
+    failures = gateway_failure_streak('sms')
+    if failures >= settings.SMS_CIRCUIT_FAILURE_THRESHOLD:
+        raise RuntimeError(f'circuit open after {failures} consecutive failures')
+
+
+def default_checks():
+    checks = {'database': check_databases, 'broker': check_broker}
+    if settings.HEALTH_CHECK_SMS_CIRCUIT:
+        checks['sms'] = check_sms_circuit
+    return checks
+
+
+class ReadinessProbe:
+    """Runs the checks and caches the result for ``interval`` seconds."""
+
+    def __init__(self, checks=None):
+        self.checks = checks
+        self.lock = threading.Lock()
+        self.result = None
+        self.checked_at = None
+
+    def is_fresh(self):
+        return self.checked_at is not None and time.monotonic() - self.checked_at < settings.HEALTH_CHECK_INTERVAL_SECONDS
+
+    def get_result(self):
+        """Return ``(ready, {check: error or None})``."""
+        if self.is_fresh():
+            return self.result
+        if not self.lock.acquire(blocking=self.result is None):
+            # Another thread is refreshing; serve the previous result meanwhile
+            return self.result
+        try:
+            if not self.is_fresh():
+                self.result = self.run_checks()
+                self.checked_at = time.monotonic()
+            return self.result
+        finally:
+            self.lock.release()
+
+    def run_checks(self):
+        errors = {}
+        for name, check in (self.checks or default_checks()).items():
+            try:
+                check()
+                errors[name] = None
+            except Exception as e:
+                logger.warning('Readiness check %s failed: %s', name, e)
+                errors[name] = str(e) or e.__class__.__name__
+        return all(error is None for error in errors.values()), errors
+
+
+readiness = ReadinessProbe()
@@ -0,0 +1,79 @@
+"""
+Idempotency-Key support for retried POST requests.
+
+A view method wrapped with :func:`idempotent` stores its first response for a
+key in the cache for IDEMPOTENCY_TTL_SECONDS. A retry with the same key and
+body gets that response replayed (with ``Idempotent-Replayed: true``) without
+running the view, so it does not touch the database or the SMS gateway. While
+the first request is still running, a retry gets 409; a key reused with a
+different body gets 422. 5xx responses are not stored, so they can be retried.
+
+The cache must be shared by all workers (CACHE_URL) for this to hold across
+processes.
+"""
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def idempotent(view_method):
+    """Decorator for APIView handler methods honouring the Idempotency-Key header."""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        digest = hashlib.sha256(f'{request.path}\n{key}'.encode()).hexdigest()
+        response_key = f'idempotency:response:{digest}'
+        lock_key = f'idempotency:lock:{digest}'
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+
+        stored = cache.get(response_key)
+        if stored is None:
+            if not cache.add(lock_key, fingerprint, timeout=settings.IDEMPOTENCY_LOCK_SECONDS):
+                # Re-check: the first request may have finished in between
+                stored = cache.get(response_key)
+                if stored is None:
+                    return Response(
+                        {'detail': 'A request with this Idempotency-Key is still being processed.'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+        if stored is not None:
+            return replay(stored, fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code < 500:
+                cache.set(
+                    response_key,
+                    {'fingerprint': fingerprint, 'status': response.status_code, 'data': response.data},
+                    timeout=settings.IDEMPOTENCY_TTL_SECONDS
+                )
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
+
+
+def replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response(
+            {'detail': f'{IDEMPOTENCY_HEADER} was already used with a different request body.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    response = Response(stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
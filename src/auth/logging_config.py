@@ -1,8 +1,19 @@
 import os
+import json
+import random
+import threading
+import time
 import logging
 import logging.handlers
+from collections import OrderedDict
 from datetime import datetime
 from pythonjsonlogger import jsonlogger
+from django.core.signals import setting_changed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Создаем директорию для логов, если она не существует
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
@@ -23,15 +34,84 @@ class CustomJsonFormatter(jsonlogger.JsonFormatter):
         if hasattr(record, 'request_id'):
             log_record['request_id'] = record.request_id
 
+
+# Стандартные атрибуты LogRecord, которые не попадают в JSON как extra-поля
+_RESERVED_RECORD_ATTRS = frozenset(
+    vars(logging.LogRecord('', 0, '', 0, '', (), None))
+) | {'message', 'asctime', 'taskName'}
+
+
+def _stdlib_dumps(log_record):
+    return json.dumps(log_record, default=str, ensure_ascii=False)
+
+
+def _orjson_dumps(log_record):
+    try:
+        return orjson.dumps(log_record, default=str).decode()
+    except TypeError:
+        # orjson не поддерживает нестроковые ключи и int > 64 бит
+        return _stdlib_dumps(log_record)
+
+
+class FastJsonFormatter(logging.Formatter):
+    """JSON formatter with the same fields as CustomJsonFormatter and less work per record."""
+
+    # (ключ в JSON, атрибут LogRecord) в порядке вывода
+    field_plan = (
+        ('level', 'levelname'),
+        ('name', 'name'),
+        ('module', 'module'),
+        ('funcName', 'funcName'),
+        ('lineNo', 'lineno'),
+    )
+
+    def __init__(self, *args, json_dumps=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if json_dumps is None:
+            json_dumps = _orjson_dumps if orjson is not None else _stdlib_dumps
+        self.json_dumps = json_dumps
+        self._timestamp_cache = (None, None)
+
+    def format_timestamp(self, created):
+        """ISO 8601 local time of ``record.created``; the date part is cached per second."""
+        second = int(created)
+        microsecond = round((created - second) * 1000000)
+        if microsecond >= 1000000:
+            return datetime.fromtimestamp(created).isoformat(timespec='microseconds')
+        cached_second, prefix = self._timestamp_cache
+        if cached_second != second:
+            prefix = datetime.fromtimestamp(second).strftime('%Y-%m-%dT%H:%M:%S')
+            self._timestamp_cache = (second, prefix)
+        return '%s.%06d' % (prefix, microsecond)
+
+    def format(self, record):
+        log_record = {'timestamp': self.format_timestamp(record.created)}
+        record_dict = record.__dict__
+        for key, attr in self.field_plan:
+            log_record[key] = record_dict[attr]
+        log_record['message'] = record.getMessage()
+
+        for key, value in record_dict.items():
+            if key not in _RESERVED_RECORD_ATTRS:
+                log_record[key] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            log_record['exc_info'] = record.exc_text
+        if record.stack_info:
+            log_record['stack_info'] = self.formatStack(record.stack_info)
+
+        return self.json_dumps(log_record)
+
+
 def setup_logging(env='production'):
     # Основной логгер
     logger = logging.getLogger('paytoleg')
     logger.setLevel(logging.INFO)
     
     # Форматтер для JSON логов
-    formatter = CustomJsonFormatter(
-        '%(timestamp)s %(level)s %(name)s %(module)s %(funcName)s %(lineNo)d %(message)s'
-    )
+    formatter = FastJsonFormatter()
 
     # Файловый обработчик с ротацией по размеру
     file_handler = logging.handlers.RotatingFileHandler(
@@ -61,4 +141,76 @@ def setup_logging(env='production'):
     return logger
 
 # Создаем и настраиваем логгер при импорте модуля
-logger = setup_logging()
\ No newline at end of file
+logger = setup_logging()
+
+
+# Структурированные события: выборка и подавление дублей настраиваются через settings.LOG_EVENTS
+_DEFAULT_EVENT_POLICY = {'sample_rate': 1.0, 'dedupe_seconds': 0}
+_DEDUPE_MAX_KEYS = 4096
+
+_event_policies = None
+_dedupe_seen = OrderedDict()
+_dedupe_lock = threading.Lock()
+
+
+def _get_event_policy(event):
+    global _event_policies
+    if _event_policies is None:
+        from django.conf import settings
+        policies = getattr(settings, 'LOG_EVENTS', {}) if settings.configured else {}
+        _event_policies = {
+            name: {**_DEFAULT_EVENT_POLICY, **policy} for name, policy in policies.items()
+        }
+    return _event_policies.get(event, _DEFAULT_EVENT_POLICY)
+
+
+def _is_duplicate(event, key, window):
+    now = time.monotonic()
+    dedupe_key = (event, key)
+    with _dedupe_lock:
+        expires_at = _dedupe_seen.get(dedupe_key)
+        if expires_at is not None and expires_at > now:
+            return True
+        _dedupe_seen[dedupe_key] = now + window
+        _dedupe_seen.move_to_end(dedupe_key)
+        while len(_dedupe_seen) > _DEDUPE_MAX_KEYS:
+            _dedupe_seen.popitem(last=False)
+    return False
+
+
+def log_event(event, msg, *args, level=logging.INFO, dedupe_key=None, **fields):
+    """Log a structured event with deferred formatting, sampling and de-duplication.
+
+    ``msg`` is formatted with ``args`` only if the record is actually emitted.
+    Returns True when the record was passed to the logger.
+    """
+    if not logger.isEnabledFor(level):
+        return False
+
+    policy = _get_event_policy(event)
+    sample_rate = policy['sample_rate']
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return False
+
+    if dedupe_key is not None and policy['dedupe_seconds'] > 0:
+        if _is_duplicate(event, dedupe_key, policy['dedupe_seconds']):
+            return False
+
+    fields['event'] = event
+    if sample_rate < 1.0:
+        fields['sample_rate'] = sample_rate
+    logger.log(level, msg, *args, extra=fields, stacklevel=2)
+    return True
+
+
+def reset_event_policies(**kwargs):
+    """Drop cached event policies and de-duplication state."""
+    global _event_policies
+    if kwargs.get('setting') not in (None, 'LOG_EVENTS'):
+        return
+    _event_policies = None
+    with _dedupe_lock:
+        _dedupe_seen.clear()
+
+
+setting_changed.connect(reset_event_policies)
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+Prometheus metrics for the auth service.
+
+When PROMETHEUS_MULTIPROC_DIR is set (gunicorn with several workers) every
+worker writes its samples to files in that directory and the /metrics view
+aggregates them, so a scrape sees the whole server and not a single worker.
+The directory must exist and be emptied before the server starts.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by route and status',
+    ['method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'HTTP requests currently being processed',
+    multiprocess_mode='livesum',
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'SQL queries executed per HTTP request',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+DB_QUERY_LATENCY = Histogram(
+    'db_query_duration_seconds',
+    'SQL query execution time',
+    ['alias'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+GATEWAY_LATENCY = Histogram(
+    'gateway_request_duration_seconds',
+    'Outbound SMS/email gateway call latency',
+    ['gateway'],
+    buckets=LATENCY_BUCKETS,
+)
+GATEWAY_FAILURES = Counter(
+    'gateway_failures_total',
+    'Failed outbound SMS/email gateway calls',
+    ['gateway'],
+)
+
+# Consecutive failed calls per gateway in this process, reset by a success;
+# the SMS readiness check treats a long streak as an open circuit. Updated
+# from gthread worker threads, so only under _streaks_lock.
+GATEWAY_FAILURE_STREAKS = defaultdict(int)
+_streaks_lock = threading.Lock()
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+def get_route(request):
+    """Route pattern of the resolved view, e.g. ``api/v1/users/<int:id>/``."""
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is None or resolver_match.route is None:
+        return UNMATCHED_ROUTE
+    return resolver_match.route
+
+
+class QueryMetrics:
+    """``execute_wrapper`` that records query time and counts queries of one request."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            DB_QUERY_LATENCY.labels(self.alias).observe(time.perf_counter() - started)
+
+
+def track_gateway(gateway):
+    """Record latency of a gateway call; a falsy result or an exception counts as a failure."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                _record_gateway_result(gateway, False)
+                raise
+            finally:
+                GATEWAY_LATENCY.labels(gateway).observe(time.perf_counter() - started)
+            _record_gateway_result(gateway, bool(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def _record_gateway_result(gateway, ok):
+    if not ok:
+        GATEWAY_FAILURES.labels(gateway).inc()
+    with _streaks_lock:
+        GATEWAY_FAILURE_STREAKS[gateway] = 0 if ok else GATEWAY_FAILURE_STREAKS[gateway] + 1
+
+
+def gateway_failure_streak(gateway):
+    """Consecutive failed calls of ``gateway`` in this process."""
+    with _streaks_lock:
+        return GATEWAY_FAILURE_STREAKS[gateway]
+
+
+def render_latest():
+    """Return ``(body, content_type)`` in the Prometheus text exposition format."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
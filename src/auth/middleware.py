@@ -1,11 +1,190 @@
+import time
 import uuid
+import jwt
+from contextlib import ExitStack
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.middleware.clickjacking import XFrameOptionsMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+from auth import db_router, metrics, timing
 from auth.logging_config import logger
 
+
+KNOWN_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+
+class RouteAwareMiddlewareMixin:
+    """Skips the middleware for requests under STATELESS_PATH_PREFIXES.
+
+    JWT API routes need neither sessions nor CSRF, messages or clickjacking
+    protection, so the middleware passes them straight to the next layer.
+    """
+
+    def is_stateless(self, request):
+        return request.path_info.startswith(settings.STATELESS_PATH_PREFIXES)
+
+    def __call__(self, request):
+        if self.is_stateless(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class RouteAwareWhiteNoiseMiddleware(RouteAwareMiddlewareMixin, WhiteNoiseMiddleware):
+    pass
+
+
+class RouteAwareSessionMiddleware(RouteAwareMiddlewareMixin, SessionMiddleware):
+    pass
+
+
+class RouteAwareCsrfViewMiddleware(RouteAwareMiddlewareMixin, CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if self.is_stateless(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class RouteAwareAuthenticationMiddleware(RouteAwareMiddlewareMixin, AuthenticationMiddleware):
+    pass
+
+
+class RouteAwareMessageMiddleware(RouteAwareMiddlewareMixin, MessageMiddleware):
+    pass
+
+
+class RouteAwareXFrameOptionsMiddleware(RouteAwareMiddlewareMixin, XFrameOptionsMiddleware):
+    pass
+
+
+class ReplicaPinningMiddleware:
+    """Scopes read-replica routing to the request and keeps read-your-writes.
+
+    Unsafe methods and users that wrote within the last REPLICA_PIN_SECONDS
+    (tracked in the cache by user id) read from the primary.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = request.method not in self.SAFE_METHODS or self.is_pinned(request)
+        token = db_router.start_request(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            written = db_router.finish_request(token)
+
+        user_id = get_user_id(request) if written else None
+        if user_id is not None:
+            db_router.pin_user(user_id)
+        return response
+
+    def is_pinned(self, request):
+        user_id = bearer_user_id(request)
+        return user_id is not None and db_router.is_user_pinned(user_id)
+
+
+def bearer_user_id(request):
+    """User id claimed by the request's JWT, read before DRF authenticates it.
+
+    The signature is not checked: the id only chooses which database serves
+    the request's reads, and a forged token merely reads from the primary.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(header) != 2 or header[0] not in jwt_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        claims = jwt.decode(header[1], options={'verify_signature': False})
+    except jwt.InvalidTokenError:
+        return None
+    user_id = claims.get(jwt_settings.USER_ID_CLAIM)
+    return str(user_id) if user_id is not None else None
+
+
+def get_user_id(request):
+    """Id of the authenticated user, resolved at most once per request.
+
+    On stateless routes ``request.user`` only exists once DRF has authenticated
+    the request, so nothing is looked up just for logging.
+    """
+    if not hasattr(request, '_logging_user_id'):
+        user = getattr(request, 'user', None)
+        request._logging_user_id = user.id if user is not None and user.is_authenticated else None
+    return request._logging_user_id
+
+
+class MetricsMiddleware:
+    """Records per-route latency, in-flight requests and SQL queries for /metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_metrics = [metrics.QueryMetrics(alias) for alias in connections]
+        started = time.perf_counter()
+        metrics.REQUESTS_IN_FLIGHT.inc()
+        try:
+            with ExitStack() as stack:
+                for query_metric in query_metrics:
+                    stack.enter_context(connections[query_metric.alias].execute_wrapper(query_metric))
+                response = self.get_response(request)
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec()
+
+        route = metrics.get_route(request)
+        method = request.method if request.method in KNOWN_METHODS else 'OTHER'
+        metrics.REQUEST_LATENCY.labels(method, route, response.status_code).observe(time.perf_counter() - started)
+        metrics.REQUEST_DB_QUERIES.labels(route).observe(sum(query_metric.count for query_metric in query_metrics))
+        return response
+
+
+class ServerTimingMiddleware:
+    """Collects per-phase timings of a request and reports them in a Server-Timing header.
+
+    Enabled with SERVER_TIMING_ENABLED; the header itself is only sent when
+    SERVER_TIMING_HEADER is also set, the totals are always added to the
+    "Request finished" log line.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.send_header = settings.SERVER_TIMING_HEADER
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        request.timings = timing.RequestTimings()
+        token = timing.activate(request.timings)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timing.db_wrapper))
+                response = self.get_response(request)
+        finally:
+            timing.deactivate(token)
+
+        if self.send_header:
+            request.timings.add('total', time.perf_counter() - started)
+            response['Server-Timing'] = request.timings.header()
+        return response
+
+
 class RequestLoggingMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
+        started = time.perf_counter()
         request_id = str(uuid.uuid4())
         request.request_id = request_id
 
@@ -21,22 +200,23 @@ class RequestLoggingMiddleware:
                 'request_id': request_id,
                 'method': request.method,
                 'path': request.path,
-                'ip': ip,
-                'user_id': request.user.id if request.user.is_authenticated else None
+                'ip': ip
             }
         )
 
         response = self.get_response(request)
 
-        logger.info(
-            'Request finished',
-            extra={
-                'request_id': request_id,
-                'status_code': response.status_code,
-                'ip': ip,
-                'user_id': request.user.id if request.user.is_authenticated else None
-            }
-        )
+        extra = {
+            'request_id': request_id,
+            'status_code': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'ip': ip,
+            'user_id': get_user_id(request)
+        }
+        timings = getattr(request, 'timings', None)
+        if timings is not None:
+            extra['timings'] = timings.as_log_fields()
+        logger.info('Request finished', extra=extra)
 
         return response
 
@@ -46,7 +226,7 @@ class RequestLoggingMiddleware:
             extra={
                 'request_id': getattr(request, 'request_id', None),
                 'error': str(exception),
-                'user_id': request.user.id if request.user.is_authenticated else None
+                'user_id': get_user_id(request)
             },
             exc_info=True
         )
@@ -0,0 +1,71 @@
+"""
+OpenAPI schema for the API.
+
+In production the schema is generated at build time by the
+``generate_openapi_schema`` command into OPENAPI_SCHEMA_DIR, collected as a
+static file and served by WhiteNoise under a hashed, immutable URL; swagger/
+only renders the UI pointing at it. The live drf_yasg generator is used when
+OPENAPI_STATIC_SCHEMA is off (development).
+"""
+from collections.abc import Sequence
+from functools import cached_property, lru_cache
+from rest_framework import permissions
+
+SCHEMA_VERSION = 'v1'
+STATIC_SCHEMA_PATH = 'openapi/swagger.json'
+
+
+class LazyParameters(Sequence):
+    """
+    ``manual_parameters`` for swagger_auto_schema built by ``build(openapi)``
+    on first use, so drf_yasg.openapi is only imported when a schema is generated.
+    """
+
+    def __init__(self, build):
+        self.build = build
+
+    @cached_property
+    def parameters(self):
+        from drf_yasg import openapi
+
+        return list(self.build(openapi))
+
+    def __getitem__(self, index):
+        return self.parameters[index]
+
+    def __len__(self):
+        return len(self.parameters)
+
+
+def get_api_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="Emugallym Auth Service",
+        default_version=SCHEMA_VERSION,
+        description="Emugallym Authentication Service",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="contact@snippets.local"),
+        license=openapi.License(name="BSD License"),
+    )
+
+
+def generate_schema():
+    """Build the full schema by introspecting every view."""
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    generator = OpenAPISchemaGenerator(info=get_api_info(), version=SCHEMA_VERSION)
+    return generator.get_schema(request=None, public=True)
+
+
+@lru_cache(maxsize=None)
+def get_swagger_ui_view():
+    # drf_yasg's generator and inspectors are only imported when swagger/ is first opened
+    from drf_yasg.views import get_schema_view
+
+    schema_view = get_schema_view(
+        get_api_info(),
+        public=True,
+        permission_classes=(permissions.AllowAny,),
+    )
+    return schema_view.with_ui('swagger', cache_timeout=0)
@@ -0,0 +1,37 @@
+"""
+JSON parser for the API that decodes with orjson when it is installed.
+
+Valid UTF-8 JSON is decoded by orjson. Anything orjson rejects is parsed
+again by rest_framework.parsers.JSONParser, so malformed bodies get the same
+ParseError and message, and input that only the stdlib accepts (NaN when
+STRICT_JSON is off) still parses. Bodies with a run of 19 or more digits go
+straight to JSONParser because orjson turns integers beyond 64 bits into
+floats.
+"""
+import io
+import re
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_LONG_DIGITS_RE = re.compile(rb'\d{19}')
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if _LONG_DIGITS_RE.search(body):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
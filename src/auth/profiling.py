@@ -0,0 +1,174 @@
+"""
+On-demand profiling of live requests.
+
+ProfilingMiddleware runs a request under cProfile when it carries a valid
+signed ``X-Profile`` header or is picked by PROFILING_SAMPLE_RATE, records the
+SQL it issued and writes ``<request_id>.prof`` and ``<request_id>.txt`` into
+PROFILING_DIR. With PROFILING_ENABLED off the middleware removes itself from
+the stack, so it costs nothing.
+
+A header value is generated with::
+
+    python manage.py shell -c "from auth.profiling import make_profile_token; print(make_profile_token())"
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from auth.logging_config import logger, LOG_DIR
+
+PROFILE_TOKEN_SALT = 'auth.profiling'
+PROFILE_TOKEN_VALUE = 'profile'
+
+
+def make_profile_token():
+    """Signed value for the X-Profile header, valid for PROFILING_TOKEN_MAX_AGE seconds."""
+    return signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).sign(PROFILE_TOKEN_VALUE)
+
+
+def is_valid_profile_token(token):
+    try:
+        value = signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return value == PROFILE_TOKEN_VALUE
+
+
+class QueryRecorder:
+    """``execute_wrapper`` collecting SQL and its duration."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((time.perf_counter() - started, sql))
+
+
+class ProfilingMiddleware:
+    """Profiles requests selected by a signed header or by sampling."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.min_interval = settings.PROFILING_MIN_INTERVAL_SECONDS
+        self.max_profiles = settings.PROFILING_MAX_PROFILES
+        self.profile_dir = settings.PROFILING_DIR or os.path.join(LOG_DIR, 'profiles')
+        self.slots = threading.BoundedSemaphore(settings.PROFILING_MAX_CONCURRENT)
+        self.last_sampled_at = 0.0
+        self.sample_lock = threading.Lock()
+        os.makedirs(self.profile_dir, exist_ok=True)
+
+    def should_profile(self, request):
+        token = request.META.get('HTTP_X_PROFILE')
+        if token:
+            return is_valid_profile_token(token)
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        # A thread that finds another one sampling skips rather than waits
+        if not self.sample_lock.acquire(blocking=False):
+            return False
+        try:
+            now = time.monotonic()
+            if now - self.last_sampled_at < self.min_interval:
+                return False
+            self.last_sampled_at = now
+            return True
+        finally:
+            self.sample_lock.release()
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        if not self.slots.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request)
+        finally:
+            self.slots.release()
+
+    def profile(self, request):
+        recorders = [QueryRecorder(alias) for alias in connections]
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for recorder in recorders:
+                stack.enter_context(connections[recorder.alias].execute_wrapper(recorder))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - started
+
+        try:
+            self.write_report(request, response, profiler, recorders, duration)
+        except OSError:
+            logger.exception('Failed to write request profile')
+        return response
+
+    def write_report(self, request, response, profiler, recorders, duration):
+        request_id = getattr(request, 'request_id', None) or str(int(time.time() * 1000))
+        base_path = os.path.join(self.profile_dir, request_id)
+        profiler.dump_stats(f'{base_path}.prof')
+
+        stats_output = io.StringIO()
+        pstats.Stats(profiler, stream=stats_output).sort_stats('cumulative').print_stats(40)
+
+        queries = [
+            (recorder.alias, query_duration, sql)
+            for recorder in recorders
+            for query_duration, sql in recorder.queries
+        ]
+        sql_duration = sum(query_duration for _, query_duration, _ in queries)
+        with open(f'{base_path}.txt', 'w') as report:
+            report.write(f'{request.method} {request.path} -> {response.status_code}\n')
+            report.write(f'request_id: {request_id}\n')
+            report.write(f'duration: {duration * 1000:.2f} ms\n')
+            report.write(f'sql: {len(queries)} queries, {sql_duration * 1000:.2f} ms\n\n')
+            for alias, query_duration, sql in queries:
+                report.write(f'[{alias}] {query_duration * 1000:.2f} ms  {sql}\n')
+            report.write('\n')
+            report.write(stats_output.getvalue())
+
+        logger.info(
+            'Request profiled',
+            extra={
+                'request_id': request_id,
+                'path': request.path,
+                'duration_ms': round(duration * 1000, 2),
+                'sql_queries': len(queries),
+                'profile': f'{base_path}.txt'
+            }
+        )
+        self.prune()
+
+    def prune(self):
+        """Keep only the newest PROFILING_MAX_PROFILES reports."""
+        reports = sorted(
+            (entry for entry in os.scandir(self.profile_dir) if entry.name.endswith('.txt')),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in reports[:-self.max_profiles]:
+            for suffix in ('.txt', '.prof'):
+                try:
+                    os.remove(entry.path[:-4] + suffix)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,47 @@
+"""
+JSON renderer for the API that encodes with orjson when it is installed.
+
+Output matches rest_framework.renderers.JSONRenderer byte for byte:
+datetimes, dates, times, decimals, lazy strings and everything else orjson
+has no native form for go through DRF's JSONEncoder.default, and U+2028 and
+U+2029 are escaped the same way. Indented, ASCII-only or non-compact output
+(the browsable API, UNICODE_JSON/COMPACT_JSON turned off) and payloads orjson
+refuses (integers beyond 64 bits, non-string keys) are rendered by
+JSONRenderer itself.
+
+Two float edge cases differ: orjson writes NaN and infinities as null where
+JSONRenderer raises, and writes exponents without a '+' (1e16, not 1e+16).
+None of the API's serializers produce floats.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Datetimes are passed to JSONEncoder.default so they keep DRF's millisecond, 'Z' suffixed format
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    def use_orjson(self, accepted_media_type, renderer_context):
+        return (
+            orjson is not None
+            and self.compact
+            and not self.ensure_ascii
+            and self.get_indent(accepted_media_type, renderer_context) is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.use_orjson(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer, so the output can be embedded in <script> tags
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -2,17 +2,22 @@ from pathlib import Path
 from os import environ as env
 from dotenv import load_dotenv
 from datetime import timedelta
-import dj_database_url
+from auth.db_pool import database_config
+from django.templatetags.static import static
+from django.utils.functional import lazy
 
 
-load_dotenv(override=True)
+# The only place .env is read; the rest of the code uses django.conf.settings.
+# Variables already set in the environment win, so callers such as
+# benchmarks/load_test.py can point the app at their own database
+load_dotenv(override=False)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
 SECRET_KEY = env['SECRET_KEY']
 
-DEBUG = env['DEBUG']
+DEBUG = env.get('DEBUG', 'False') == 'True'
 
 ALLOWED_HOSTS = env['ALLOWED_HOSTS'].split(',')
 
@@ -34,17 +39,25 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'auth.middleware.MetricsMiddleware',
+    'auth.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'auth.middleware.ReplicaPinningMiddleware',
+    'auth.middleware.RouteAwareWhiteNoiseMiddleware',
+    'auth.middleware.RouteAwareSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'auth.middleware.RouteAwareCsrfViewMiddleware',
+    'auth.middleware.RouteAwareAuthenticationMiddleware',
+    'auth.middleware.RouteAwareMessageMiddleware',
+    'auth.middleware.RouteAwareXFrameOptionsMiddleware',
     'auth.middleware.RequestLoggingMiddleware',
+    'auth.profiling.ProfilingMiddleware',
 ]
 
+# Paths served by the JWT-only API: session, CSRF, auth, messages,
+# clickjacking and static file middleware are skipped for them
+STATELESS_PATH_PREFIXES = ('/api/', '/metrics', '/healthz', '/readyz')
+
 ROOT_URLCONF = 'auth.urls'
 
 TEMPLATES = [
@@ -74,12 +87,30 @@ WSGI_APPLICATION = 'auth.wsgi.application'
 # }
 
 
+# Persistent health-checked connections, or a psycopg pool when DATABASE_URL
+# has pool parameters, see auth/db_pool.py
 DATABASES = {
-    'default': dj_database_url.config(
-        default=env["DATABASE_URL"],
-        conn_max_age=600,
-    )
+    'default': database_config(env["DATABASE_URL"], conn_max_age=600),
 }
+DATABASE_POOL_STATS_INTERVAL = int(env.get('DATABASE_POOL_STATS_INTERVAL', 60))
+
+# Optional read replica for user reads, see auth/db_router.py.
+# In tests the replica mirrors the default database unless
+# DATABASE_REPLICA_TEST_MIRROR=False, then it gets its own test database,
+# the only case in which a replica alias is migrated.
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_MIGRATE = False
+if env.get('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = database_config(env['DATABASE_REPLICA_URL'], conn_max_age=600)
+    if env.get('DATABASE_REPLICA_TEST_MIRROR', 'True') == 'True':
+        DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    else:
+        DATABASE_REPLICA_MIGRATE = True
+    DATABASE_REPLICAS = ['replica']
+
+DATABASE_ROUTERS = ['auth.db_router.PrimaryReplicaRouter']
+REPLICA_READ_MODELS = ('account.customuser',)
+REPLICA_PIN_SECONDS = int(env.get('REPLICA_PIN_SECONDS', 5))
 
 AUTH_USER_MODEL = 'account.CustomUser' 
 
@@ -98,6 +129,38 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+PASSWORD_HASHERS = [
+    'auth.hashers.TimedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# /metrics is refused unless the scraper sends "Authorization: Bearer <METRICS_TOKEN>"
+# or connects from METRICS_ALLOWED_NETWORKS (comma separated addresses or CIDRs)
+METRICS_TOKEN = env.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_NETWORKS = [network.strip() for network in env.get('METRICS_ALLOWED_NETWORKS', '').split(',') if network.strip()]
+
+# /readyz: dependency checks are cached per process for the interval, see auth/health.py
+HEALTH_CHECK_INTERVAL_SECONDS = float(env.get('HEALTH_CHECK_INTERVAL_SECONDS', 5))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(env.get('HEALTH_CHECK_TIMEOUT_SECONDS', 2))
+HEALTH_CHECK_SMS_CIRCUIT = env.get('HEALTH_CHECK_SMS_CIRCUIT', 'False') == 'True'
+SMS_CIRCUIT_FAILURE_THRESHOLD = int(env.get('SMS_CIRCUIT_FAILURE_THRESHOLD', 5))
+
+# Per-request timings of SQL, password hashing and SMS/email gateway calls
+SERVER_TIMING_ENABLED = env.get('SERVER_TIMING_ENABLED', 'False') == 'True'
+SERVER_TIMING_HEADER = env.get('SERVER_TIMING_HEADER', 'False') == 'True'
+
+# On-demand request profiling, see auth/profiling.py
+PROFILING_ENABLED = env.get('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SAMPLE_RATE = float(env.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_MIN_INTERVAL_SECONDS = float(env.get('PROFILING_MIN_INTERVAL_SECONDS', 60))
+PROFILING_MAX_CONCURRENT = int(env.get('PROFILING_MAX_CONCURRENT', 1))
+PROFILING_MAX_PROFILES = int(env.get('PROFILING_MAX_PROFILES', 50))
+PROFILING_TOKEN_MAX_AGE = int(env.get('PROFILING_TOKEN_MAX_AGE', 300))
+PROFILING_DIR = env.get('PROFILING_DIR')  # defaults to <logs>/profiles
+
 
 LANGUAGE_CODE = 'en-us'
 
@@ -109,7 +172,18 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'static'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# STATICFILES_STORAGE is no longer read by Django 5.1+, so hashed names (and
+# WhiteNoise's immutable caching of them) need STORAGES
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+
+# Pre-generated OpenAPI schema (manage.py generate_openapi_schema), collected
+# as static/openapi/ and served with immutable caching by WhiteNoise
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'openapi'
+OPENAPI_STATIC_SCHEMA = env.get('OPENAPI_STATIC_SCHEMA', str(not DEBUG)) == 'True'
+STATICFILES_DIRS = [('openapi', OPENAPI_SCHEMA_DIR)] if OPENAPI_SCHEMA_DIR.is_dir() else []
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -120,14 +194,42 @@ AUTHENTICATION_BACKENDS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # orjson-backed when installed, byte-identical to DRF's JSON classes otherwise
+    'DEFAULT_RENDERER_CLASSES': (
+        'auth.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'auth.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
+# users/changes/ feed: page sizes and how long a fresh change is held back so
+# transactions still in flight cannot commit behind an issued cursor
+USER_CHANGE_FEED_PAGE_SIZE = int(env.get('USER_CHANGE_FEED_PAGE_SIZE', 100))
+USER_CHANGE_FEED_MAX_PAGE_SIZE = int(env.get('USER_CHANGE_FEED_MAX_PAGE_SIZE', 1000))
+USER_CHANGE_FEED_SETTLE_SECONDS = int(env.get('USER_CHANGE_FEED_SETTLE_SECONDS', 5))
+
+# users/stats/ is served from a summary row refreshed this often (by the
+# refresh-user-stats beat task); clients may cache it as long
+USER_STATS_REFRESH_SECONDS = int(env.get('USER_STATS_REFRESH_SECONDS', 5 * 60))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=10),
 }
 
+# Profile claims embedded in issued tokens (see account/tokens.py) and the
+# encoded size above which trailing claims are dropped
+JWT_PROFILE_CLAIMS = tuple(filter(None, env.get(
+    'JWT_PROFILE_CLAIMS',
+    'role,profile_version,is_phone_verified,is_email_verified,fullname,educational_institution'
+).split(',')))
+JWT_MAX_TOKEN_BYTES = int(env.get('JWT_MAX_TOKEN_BYTES', 1024))
+
 SWAGGER_SETTINGS = {
     "SECURITY_DEFINITIONS": {
         "Bearer": {
@@ -137,13 +239,92 @@ SWAGGER_SETTINGS = {
         }
     } 
 }
-
-CELERY_BROKER_URL = 'redis://:redis_password@redis:6379/0'
+if OPENAPI_STATIC_SCHEMA:
+    SWAGGER_SETTINGS["SPEC_URL"] = lazy(static, str)('openapi/swagger.json')
+
+# Shared cache (Idempotency-Key responses); per-process memory when CACHE_URL is unset
+if env.get('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': env['CACHE_URL'],
+        }
+    }
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+IDEMPOTENCY_TTL_SECONDS = int(env.get('IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60))
+IDEMPOTENCY_LOCK_SECONDS = int(env.get('IDEMPOTENCY_LOCK_SECONDS', 30))
+
+# User change events for remote cache invalidation (see account/events.py)
+USER_EVENTS_ENABLED = env.get('USER_EVENTS_ENABLED', 'True') == 'True'
+USER_EVENTS_REDIS_URL = env.get('USER_EVENTS_REDIS_URL', env['REDIS_URL'])
+USER_EVENTS_CHANNEL = env.get('USER_EVENTS_CHANNEL', 'user-changes')
+USER_EVENTS_REDIS_TIMEOUT_SECONDS = float(env.get('USER_EVENTS_REDIS_TIMEOUT_SECONDS', 0.5))
+USER_EVENTS_RETRY_SECONDS = int(env.get('USER_EVENTS_RETRY_SECONDS', 30))
+
+CELERY_BROKER_URL = env['REDIS_URL']
+# Run tasks inline instead of queueing them, for local load tests without a worker
+CELERY_TASK_ALWAYS_EAGER = env.get('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# Interactive verification codes must never wait behind a campaign, so each
+# kind of work has its own queue and its own worker (see docker-compose.yml)
+CELERY_TASK_QUEUES = {
+    'otp': {'exchange': 'otp', 'routing_key': 'otp'},
+    'default': {'exchange': 'default', 'routing_key': 'default'},
+    'bulk': {'exchange': 'bulk', 'routing_key': 'bulk'},
+    'maintenance': {'exchange': 'maintenance', 'routing_key': 'maintenance'},
+}
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    'account.tasks.send_sms_async': {'queue': 'otp', 'priority': 0},
+    'account.tasks.send_sms_batch': {'queue': 'bulk', 'priority': 9},
+    'account.tasks.send_verification_codes': {'queue': 'bulk', 'priority': 9},
+    'account.tasks.cleanup_*': {'queue': 'maintenance'},
+    'account.tasks.refresh_*': {'queue': 'maintenance'},
+}
+# Redis emulates priorities with one list per step; 0 is served first
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'queue_order_strategy': 'priority',
+}
+# Nobody reads task results; acks_late with a prefetch of one re-delivers the
+# task if a worker dies and keeps long bulk tasks from hoarding messages
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(env.get('CELERY_WORKER_PREFETCH_MULTIPLIER', 1))
+CELERY_BEAT_SCHEDULE = {
+    'cleanup-verified-verifications': {
+        'task': 'account.tasks.cleanup_verified_verifications',
+        'schedule': 24 * 60 * 60,
+    },
+    'refresh-user-stats': {
+        'task': 'account.tasks.refresh_user_stats',
+        'schedule': USER_STATS_REFRESH_SECONDS,
+    },
+}
+
+# Numbers per gateway call for campaign SMS, see account.tasks.send_bulk_sms
+SMS_BATCH_SIZE = int(env.get('SMS_BATCH_SIZE', 100))
+# Pace of the resend_verification_codes command, in codes per minute
+VERIFICATION_RESEND_RATE_PER_MINUTE = int(env.get('VERIFICATION_RESEND_RATE_PER_MINUTE', 300))
+VERIFICATION_RETENTION_DAYS = int(env.get('VERIFICATION_RETENTION_DAYS', 30))
+
+
+# Per-event logging policy for auth.logging_config.log_event:
+# sample_rate - share of records kept, dedupe_seconds - window for suppressing repeats per key
+LOG_EVENTS = {
+    'user.created': {'dedupe_seconds': 60},
+    'phone.verified': {'dedupe_seconds': 60},
+    'email.verified': {'dedupe_seconds': 60},
+    'sms.sent': {'sample_rate': float(env.get('LOG_SMS_SENT_SAMPLE_RATE', 0.1))},
+    'email.sent': {'sample_rate': float(env.get('LOG_EMAIL_SENT_SAMPLE_RATE', 0.1))},
+    'verification.created': {'sample_rate': float(env.get('LOG_VERIFICATION_CREATED_SAMPLE_RATE', 0.1))},
+}
+
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = env.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 # EMAIL_USE_SSL = True
@@ -152,4 +333,12 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'rasulov.olympusss@gmail.com'
 EMAIL_HOST_PASSWORD = env['EMAIL_HOST_PASSWORD']
 
-DEFAULT_FROM_EMAIL = 'E-mugallym <rasulov.olympusss@gmail.com>'
\ No newline at end of file
+DEFAULT_FROM_EMAIL = 'E-mugallym <rasulov.olympusss@gmail.com>'
+
+PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES = int(env.get('PHONE_NUMBER_VERIFICATION_CODE_EXPIRATION_MINUTES', 10))
+# Country calling code for phone numbers written without one (Turkmenistan)
+PHONE_NUMBER_DEFAULT_COUNTRY_CODE = env.get('PHONE_NUMBER_DEFAULT_COUNTRY_CODE', '993')
+
+ZENDER_API_KEY = env['ZENDER_API_KEY']
+ZENDER_SENDER_ID = env['ZENDER_SENDER_ID']
+ZENDER_BASE_URL = env.get('ZENDER_BASE_URL', 'https://salebot.demo.zoomnearby.com/api')
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+Request-scoped timing of the expensive phases of a request.
+
+ServerTimingMiddleware activates a RequestTimings collector for the current
+request; SQL queries, password hashing and gateway calls add their durations
+to it. Outside of a request (management commands, Celery) measuring is a no-op.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+_current_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Accumulated count and duration per phase of one request."""
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, phase, seconds):
+        count, total = self.phases.get(phase, (0, 0.0))
+        self.phases[phase] = (count + 1, total + seconds)
+
+    def header(self):
+        """Value for the ``Server-Timing`` response header."""
+        return ', '.join(
+            f'{phase};dur={total * 1000:.2f};desc="{count}x"'
+            for phase, (count, total) in self.phases.items()
+        )
+
+    def as_log_fields(self):
+        fields = {}
+        for phase, (count, total) in self.phases.items():
+            fields[f'{phase}_ms'] = round(total * 1000, 2)
+            fields[f'{phase}_count'] = count
+        return fields
+
+
+def activate(timings):
+    return _current_timings.set(timings)
+
+
+def deactivate(token):
+    _current_timings.reset(token)
+
+
+def record(phase, seconds):
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+@contextmanager
+def measure(phase):
+    if _current_timings.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - started)
+
+
+def timed(phase):
+    """Decorator form of :func:`measure`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """``execute_wrapper`` adding query time to the ``db`` phase."""
+    with measure('db'):
+        return execute(sql, params, many, context)
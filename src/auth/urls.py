@@ -1,24 +1,23 @@
+from django.conf import settings
 from django.contrib import admin
+from django.shortcuts import redirect
+from django.templatetags.static import static
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+from auth import openapi, views
+
+
+def swagger_ui(request, *args, **kwargs):
+   if settings.OPENAPI_STATIC_SCHEMA and 'format' in request.GET:
+      # The schema itself is a pre-generated static file, never built per request
+      return redirect(static(openapi.STATIC_SCHEMA_PATH))
+   return openapi.get_swagger_ui_view()(request, *args, **kwargs)
 
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Emugallym Auth Service",
-      default_version='v1',
-      description="Emugallym Authentication Service",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="contact@snippets.local"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
 
 urlpatterns = [
    path('admin/', admin.site.urls),
-   path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+   path('swagger/', swagger_ui, name='schema-swagger-ui'),
    path('api/v1/', include('account.api.urls')),
-]
\ No newline at end of file
+   path('metrics', views.metrics_view, name='metrics'),
+   path('healthz', views.healthz_view, name='healthz'),
+   path('readyz', views.readyz_view, name='readyz'),
+]
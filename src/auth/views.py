@@ -0,0 +1,47 @@
+import ipaddress
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+from auth import health, metrics
+
+
+def is_metrics_scraper(request):
+    """True for requests with METRICS_TOKEN or from METRICS_ALLOWED_NETWORKS."""
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if settings.METRICS_TOKEN and constant_time_compare(header, f'Bearer {settings.METRICS_TOKEN}'):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+@require_GET
+def metrics_view(request):
+    """Expose Prometheus metrics in the text exposition format."""
+    if not is_metrics_scraper(request):
+        return HttpResponseForbidden()
+    body, content_type = metrics.render_latest()
+    return HttpResponse(body, content_type=content_type)
+
+
+@never_cache
+@require_GET
+def healthz_view(request):
+    """Liveness: the process is up and serving requests."""
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+@require_GET
+def readyz_view(request):
+    """Readiness: dependencies were reachable at the last (cached) check."""
+    ready, errors = health.readiness.get_result()
+    checks = {name: 'ok' if error is None else error for name, error in errors.items()}
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+        status=200 if ready else 503,
+    )
@@ -0,0 +1,58 @@
+"""
+Warm-up helpers called from the gunicorn hooks in gunicorn.conf.py.
+
+prime_caches() runs once in the master after the preloaded application has
+been imported, so the work is shared with every worker through copy-on-write.
+warm_connections() runs in each worker after it is initialised, because
+database connections must never be shared between processes. Django keeps
+one connection per thread, so with the gthread worker every thread of the
+pool is warmed.
+"""
+import threading
+from django.db import connections
+from auth.logging_config import logger
+
+
+def prime_caches():
+    """Import the URLconf, views and serializers and fill lazily built caches."""
+    from django.contrib.auth.hashers import get_hashers
+    from django.urls import resolve
+    from rest_framework.settings import api_settings
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+    from account.api import serializers
+
+    resolve('/api/v1/users/')
+    get_hashers()
+    for setting in ('DEFAULT_AUTHENTICATION_CLASSES', 'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES'):
+        getattr(api_settings, setting)
+    jwt_settings.ACCESS_TOKEN_LIFETIME
+    serializers.UsersListSerializer().fields
+
+
+def open_connections():
+    """Connect to every configured database so the first request does not pay for it."""
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except Exception:
+            logger.warning('Warm-up could not connect to database %s', connection.alias, exc_info=True)
+
+
+def warm_connections(thread_pool=None, threads=1):
+    """Open connections in the current thread or in each thread of ``thread_pool``."""
+    if thread_pool is None:
+        open_connections()
+        return
+
+    # The barrier keeps each task on its own thread until all of them have connected
+    barrier = threading.Barrier(threads, timeout=10)
+
+    def warm_thread():
+        open_connections()
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+
+    for _ in range(threads):
+        thread_pool.submit(warm_thread)
@@ -0,0 +1,63 @@
+"""
+Gunicorn configuration for the auth service.
+
+Picked up automatically when gunicorn is started from this directory;
+every value can be overridden with a GUNICORN_* environment variable.
+"""
+import multiprocessing
+import os
+from os import environ as env
+
+bind = env.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Password hashing is CPU bound: one process per core plus one, a few threads
+# each to overlap database and SMS/SMTP waits.
+workers = int(env.get('GUNICORN_WORKERS', multiprocessing.cpu_count() + 1))
+worker_class = env.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(env.get('GUNICORN_THREADS', 4))
+
+# Import Django and the URLconf once in the master and share it with workers
+preload_app = env.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Recycle workers to bound memory growth, with jitter so they don't restart together
+max_requests = int(env.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(env.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+timeout = int(env.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(env.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(env.get('GUNICORN_KEEPALIVE', 5))
+
+# Shared directory for prometheus_client multiprocess mode. It has to exist
+# before the application (and prometheus_client) is imported; it is emptied
+# in on_starting, since this module is executed again on every reload.
+if workers > 1:
+    env.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus')
+if env.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    # Once per master start: a reload (SIGHUP) must keep the live workers' files
+    if env.get('PROMETHEUS_MULTIPROC_DIR'):
+        for name in os.listdir(env['PROMETHEUS_MULTIPROC_DIR']):
+            os.remove(os.path.join(env['PROMETHEUS_MULTIPROC_DIR'], name))
+
+
+def when_ready(server):
+    if preload_app:
+        from auth.warmup import prime_caches
+        prime_caches()
+
+
+def post_worker_init(worker):
+    from auth.warmup import prime_caches, warm_connections
+    if not preload_app:
+        prime_caches()
+    # gthread workers serve requests from worker.tpool, sync workers from the main thread
+    warm_connections(getattr(worker, 'tpool', None), threads)
+
+
+def child_exit(server, worker):
+    if env.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)